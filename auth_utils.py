@@ -2,7 +2,11 @@ from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import asyncio
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -20,6 +24,92 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+# bcrypt занимает десятки миллисекунд CPU, поэтому в async-обработчиках он выполняется
+# в отдельном пуле потоков с ограниченной очередью ожидания
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "64"))
+
+class PasswordHasherBusy(Exception):
+    """Очередь пула хеширования переполнена, запрос нужно повторить позже"""
+
+class PasswordHasher:
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        # Выполняющиеся и ожидающие операции
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        # Последние замеры (мс): ожидание в очереди и время самого хеширования
+        self._wait_ms = deque(maxlen=1024)
+        self._run_ms = deque(maxlen=1024)
+
+    async def run(self, func, *args):
+        if self._in_flight >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise PasswordHasherBusy()
+
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            result = func(*args)
+            return started, result, time.perf_counter()
+
+        def release(_future) -> None:
+            # Вызывается из потока пула: счетчик меняем в цикле событий
+            try:
+                loop.call_soon_threadsafe(self._release)
+            except RuntimeError:
+                pass  # цикл событий уже закрыт
+
+        future = self._executor.submit(timed)
+        self._in_flight += 1
+        # Место освобождается, когда хеширование действительно закончилось (или отменено
+        # до начала): отмена запроса не останавливает уже работающий поток bcrypt
+        future.add_done_callback(release)
+        started, result, finished = await asyncio.wrap_future(future)
+
+        self.completed += 1
+        self._wait_ms.append((started - submitted) * 1000)
+        self._run_ms.append((finished - started) * 1000)
+        return result
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+
+    @staticmethod
+    def _percentiles(samples) -> dict:
+        if not samples:
+            return {"p50": None, "p95": None, "max": None}
+        ordered = sorted(samples)
+        return {
+            "p50": round(ordered[len(ordered) // 2], 2),
+            "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+            "max": round(ordered[-1], 2)
+        }
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": self._in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_ms": self._percentiles(self._wait_ms),
+            "hash_ms": self._percentiles(self._run_ms)
+        }
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_SIZE)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_hasher.run(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
 
@@ -0,0 +1,3 @@
+# Нагрузочные бенчмарки API:
+# - benchmarks.seed - генерация пользователей и задач с реалистичными распределениями
+# - benchmarks.load - асинхронная нагрузка по сценариям с отчетом RPS и p50/p95/p99
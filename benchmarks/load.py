@@ -0,0 +1,229 @@
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+import httpx
+from benchmarks.seed import BENCH_PASSWORD, TITLE_WORDS
+
+# Нагрузка на запущенное приложение: виртуальные пользователи входят под пользователями
+# benchmarks.seed и выполняют взвешенные сценарии. В конце печатается RPS и p50/p95/p99
+# по каждому эндпоинту (и, при --json, сохраняется для сравнения релизов).
+# Запуск: uvicorn main:app --workers 1 &  python -m benchmarks.load --duration 30 --concurrency 20
+
+API = "/api/v3"
+
+# Сценарий -> вес по умолчанию
+DEFAULT_WEIGHTS = {
+    "login": 2,
+    "list": 35,
+    "search": 15,
+    "create": 15,
+    "complete": 10,
+    "stats": 23,
+}
+
+
+class Recorder:
+    """Задержки и ошибки по эндпоинтам"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        # Ошибки по HTTP-статусам (0 - сетевая ошибка): 500 означает ошибку в приложении
+        self.statuses: Dict[int, int] = defaultdict(int)
+
+    async def request(self, client: httpx.AsyncClient, endpoint: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, API + url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[endpoint] += 1
+            self.statuses[0] += 1
+            return None
+        self.latencies[endpoint].append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            self.errors[endpoint] += 1
+            self.statuses[response.status_code] += 1
+            return None
+        return response
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Перцентиль по ближайшему рангу"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, user_number: int, rng: random.Random):
+        self.client = client
+        self.recorder = recorder
+        self.email = f"bench{user_number}@example.com"
+        self.rng = rng
+        self.headers: Dict[str, str] = {}
+        self.pending_ids: List[int] = []
+
+    async def login(self) -> bool:
+        response = await self.recorder.request(
+            self.client, "POST /auth/login", "POST", "/auth/login",
+            data={"username": self.email, "password": BENCH_PASSWORD}
+        )
+        if response is None:
+            return False
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return True
+
+    async def list(self) -> None:
+        response = await self.recorder.request(
+            self.client, "GET /tasks", "GET", "/tasks?limit=50", headers=self.headers
+        )
+        # Иногда листаем на следующую страницу
+        if response is not None and response.json().get("next_cursor") and self.rng.random() < 0.3:
+            await self.recorder.request(
+                self.client, "GET /tasks (cursor)", "GET", "/tasks",
+                params={"limit": 50, "cursor": response.json()["next_cursor"]}, headers=self.headers
+            )
+
+    async def search(self) -> None:
+        await self.recorder.request(
+            self.client, "GET /tasks/search", "GET", "/tasks/search",
+            params={"q": self.rng.choice(TITLE_WORDS)}, headers=self.headers
+        )
+
+    async def create(self) -> None:
+        deadline = None
+        if self.rng.random() < 0.7:
+            deadline = time.strftime(
+                "%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + self.rng.uniform(0, 30 * 86400))
+            )
+        response = await self.recorder.request(
+            self.client, "POST /tasks", "POST", "/tasks", headers=self.headers, json={
+                "title": f"{self.rng.choice(TITLE_WORDS).capitalize()} нагрузка",
+                "description": "Создано benchmarks.load",
+                "is_important": self.rng.random() < 0.4,
+                "deadline_at": deadline
+            }
+        )
+        if response is not None:
+            self.pending_ids.append(response.json()["id"])
+
+    async def complete(self) -> None:
+        if not self.pending_ids:
+            await self.create()
+            return
+        task_id = self.pending_ids.pop(self.rng.randrange(len(self.pending_ids)))
+        await self.recorder.request(
+            self.client, "PATCH /tasks/{id}/complete", "PATCH", f"/tasks/{task_id}/complete",
+            headers=self.headers
+        )
+
+    async def stats(self) -> None:
+        await self.recorder.request(self.client, "GET /stats/", "GET", "/stats/", headers=self.headers)
+
+    async def run(self, deadline: float, weights: Dict[str, int]) -> None:
+        if not await self.login():
+            return
+        scenarios = list(weights)
+        scenario_weights = [weights[name] for name in scenarios]
+        while time.perf_counter() < deadline:
+            scenario = self.rng.choices(scenarios, weights=scenario_weights)[0]
+            await getattr(self, scenario)()
+
+
+def parse_weights(value: Optional[str]) -> Dict[str, int]:
+    """'list=50,search=10' -> веса сценариев (неуказанные берутся по умолчанию)"""
+    weights = dict(DEFAULT_WEIGHTS)
+    if value:
+        for item in value.split(","):
+            name, _, weight = item.partition("=")
+            if name not in DEFAULT_WEIGHTS:
+                raise SystemExit(f"Неизвестный сценарий: {name}. Доступны: {', '.join(DEFAULT_WEIGHTS)}")
+            weights[name] = int(weight)
+    return {name: weight for name, weight in weights.items() if weight > 0}
+
+
+def report(recorder: Recorder, elapsed: float) -> dict:
+    results = {}
+    total = 0
+    print(f"\n{'Эндпоинт':<28}{'Запросов':>10}{'Ошибок':>8}{'RPS':>9}{'p50 мс':>9}{'p95 мс':>9}{'p99 мс':>9}{'max мс':>9}")
+    for endpoint in sorted(set(recorder.latencies) | set(recorder.errors)):
+        values = sorted(recorder.latencies[endpoint])
+        total += len(values)
+        results[endpoint] = {
+            "requests": len(values),
+            "errors": recorder.errors[endpoint],
+            "rps": round(len(values) / elapsed, 1),
+            "p50_ms": round(percentile(values, 50), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+            "max_ms": round(values[-1], 2) if values else 0.0,
+        }
+        row = results[endpoint]
+        print(
+            f"{endpoint:<28}{row['requests']:>10}{row['errors']:>8}{row['rps']:>9}"
+            f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}{row['max_ms']:>9}"
+        )
+    print(f"\nВсего: {total} запросов за {elapsed:.1f} с, {total / elapsed:.1f} RPS")
+    if recorder.statuses:
+        print("Ошибки по статусам: " + ", ".join(
+            f"{status or 'сеть'}: {count}" for status, count in sorted(recorder.statuses.items())
+        ))
+    return {
+        "duration_s": round(elapsed, 1),
+        "total_rps": round(total / elapsed, 1),
+        "error_statuses": {str(status): count for status, count in sorted(recorder.statuses.items())},
+        "endpoints": results
+    }
+
+
+async def run_load(args: argparse.Namespace) -> dict:
+    weights = parse_weights(args.weights)
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        rng = random.Random(args.seed)
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*[
+            VirtualUser(client, recorder, i % args.users + 1, random.Random(rng.random())).run(deadline, weights)
+            for i in range(args.concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+    return report(recorder, elapsed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест API по взвешенным сценариям")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="Адрес запущенного приложения")
+    parser.add_argument("--users", type=int, default=100, help="Сколько пользователей создал benchmarks.seed")
+    parser.add_argument("--concurrency", type=int, default=20, help="Количество виртуальных пользователей")
+    parser.add_argument("--duration", type=float, default=30, help="Длительность теста, с")
+    parser.add_argument("--weights", help=f"Веса сценариев, например list=50,search=10 (по умолчанию {DEFAULT_WEIGHTS})")
+    parser.add_argument("--timeout", type=float, default=30, help="Таймаут одного запроса, с")
+    parser.add_argument("--seed", type=int, default=42, help="Зерно генератора случайных чисел")
+    parser.add_argument("--json", help="Сохранить результаты в JSON-файл")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_load(args))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"Результаты сохранены в {args.json}")
+    # Ошибки сервера - это сбой приложения, а не нагрузки: прогон не считается успешным
+    server_errors = sum(
+        count for status, count in results["error_statuses"].items() if status.startswith("5") and status != "503"
+    )
+    if server_errors:
+        print(f"Ответов 5xx от приложения: {server_errors} - смотрите лог сервера")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
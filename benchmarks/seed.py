@@ -0,0 +1,144 @@
+import argparse
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+# Генерация данных для бенчмарка: N пользователей bench1..benchN (пароль BENCH_PASSWORD)
+# и M задач, распределенных между ними неравномерно (у немногих пользователей много задач).
+# Запуск: python -m benchmarks.seed --users 100 --tasks 100000 [--database-url ...] [--reset]
+# Сидировать лучше до запуска сервера: версии данных и кеши в обход API не обновляются.
+
+BENCH_PASSWORD = "bench_password"
+
+# Слова для названий задач (их же ищет сценарий поиска в benchmarks.load)
+TITLE_WORDS = (
+    "отчет", "встреча", "презентация", "звонок", "договор", "бюджет", "ревью",
+    "релиз", "документация", "планирование", "клиент", "счет", "исследование", "дизайн"
+)
+TITLE_TARGETS = ("проекта", "команды", "квартала", "клиента", "отдела", "продукта", "сервера")
+
+# Дедлайны относительно текущего момента: (вес, от, до) в часах
+DEADLINE_RANGES = (
+    (10, -24 * 30, 0),            # просроченные
+    (20, 0, 24 * 4),              # срочные (ближайшие дни)
+    (40, 24 * 4, 24 * 30),        # в течение месяца
+    (30, 24 * 30, 24 * 365),      # дальние
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Генерация пользователей и задач для бенчмарка")
+    parser.add_argument("--users", type=int, default=100, help="Количество пользователей")
+    parser.add_argument("--tasks", type=int, default=100000, help="Количество задач")
+    parser.add_argument("--important-ratio", type=float, default=0.4, help="Доля важных задач")
+    parser.add_argument("--no-deadline-ratio", type=float, default=0.25, help="Доля задач без дедлайна")
+    parser.add_argument("--completed-ratio", type=float, default=0.5, help="Доля выполненных задач")
+    parser.add_argument("--history-days", type=int, default=180, help="За сколько дней созданы задачи")
+    parser.add_argument("--skew", type=float, default=1.5, help="Неравномерность задач по пользователям (параметр Парето)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Строк в одном INSERT")
+    parser.add_argument("--seed", type=int, default=42, help="Зерно генератора случайных чисел")
+    parser.add_argument("--database-url", help="Строка подключения (по умолчанию DATABASE_URL)")
+    parser.add_argument("--reset", action="store_true", help="Удалить ранее созданных пользователей бенчмарка и их задачи")
+    return parser.parse_args()
+
+
+def random_deadline(rng: random.Random, now: datetime, no_deadline_ratio: float):
+    if rng.random() < no_deadline_ratio:
+        return None
+    _, low, high = rng.choices(DEADLINE_RANGES, weights=[r[0] for r in DEADLINE_RANGES])[0]
+    return now + timedelta(hours=rng.uniform(low, high))
+
+
+def generate_tasks(args: argparse.Namespace, rng: random.Random, user_ids: list, now: datetime):
+    """Порождает строки задач пачками по chunk_size"""
+    from models.task import compute_quadrant
+
+    weights = [rng.paretovariate(args.skew) for _ in user_ids]
+    chunk = []
+    for _ in range(args.tasks):
+        is_important = rng.random() < args.important_ratio
+        deadline_at = random_deadline(rng, now, args.no_deadline_ratio)
+        created_at = now - timedelta(seconds=rng.uniform(0, args.history_days * 86400))
+        completed = rng.random() < args.completed_ratio
+        chunk.append({
+            "title": f"{rng.choice(TITLE_WORDS).capitalize()} {rng.choice(TITLE_TARGETS)}",
+            "description": f"{rng.choice(TITLE_WORDS)} и {rng.choice(TITLE_WORDS)}" if rng.random() < 0.6 else None,
+            "is_important": is_important,
+            "deadline_at": deadline_at,
+            "quadrant": compute_quadrant(is_important, deadline_at),
+            "completed": completed,
+            "created_at": created_at,
+            "completed_at": created_at + (now - created_at) * rng.random() if completed else None,
+            "user_id": rng.choices(user_ids, weights=weights)[0]
+        })
+        if len(chunk) >= args.chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def seed(args: argparse.Namespace) -> None:
+    from sqlalchemy import select, insert, delete
+    from database import engine
+    from migrations import run_migrations
+    from models import Task, User, UserRole, UserDataVersion
+    from auth_utils import get_password_hash
+
+    rng = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+    started = time.perf_counter()
+
+    async with engine.begin() as conn:
+        await run_migrations(conn)
+
+        if args.reset:
+            result = await conn.execute(select(User.id).where(User.nickname.like("bench%")))
+            old_ids = result.scalars().all()
+            if old_ids:
+                await conn.execute(delete(Task).where(Task.user_id.in_(old_ids)))
+                await conn.execute(delete(UserDataVersion).where(UserDataVersion.user_id.in_(old_ids)))
+                await conn.execute(delete(User).where(User.id.in_(old_ids)))
+                print(f"Удалено пользователей бенчмарка: {len(old_ids)}")
+
+        # bcrypt медленный - хеш один на всех пользователей
+        hashed_password = get_password_hash(BENCH_PASSWORD)
+        result = await conn.execute(
+            insert(User).returning(User.id),
+            [
+                {
+                    "nickname": f"bench{i}",
+                    "email": f"bench{i}@example.com",
+                    "hashed_password": hashed_password,
+                    "role": UserRole.USER
+                }
+                for i in range(1, args.users + 1)
+            ]
+        )
+        user_ids = result.scalars().all()
+    print(f"Создано пользователей: {len(user_ids)}")
+
+    inserted = 0
+    for chunk in generate_tasks(args, rng, user_ids, now):
+        # Каждая пачка - отдельная транзакция, чтобы не держать одну огромную
+        async with engine.begin() as conn:
+            await conn.execute(insert(Task), chunk)
+        inserted += len(chunk)
+        print(f"Задач загружено: {inserted}/{args.tasks}", end="\r")
+
+    await engine.dispose()
+    print(f"\nГотово за {time.perf_counter() - started:.1f} с")
+
+
+def main() -> None:
+    args = parse_args()
+    # Строку подключения нужно задать до импорта database
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    asyncio.run(seed(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import asyncio
+import os
+from typing import Dict, Iterator, List, Optional, Set
+import orjson
+from sqlalchemy.engine import make_url
+from database import DATABASE_URL, DB_CONNECTION_MODE
+from serializers import dumps
+from task_events import on_task_events_committed
+from user_cache import UserPrincipal
+
+# Лента изменений задач для клиентов (GET /tasks/events, Server-Sent Events).
+# События зафиксированных транзакций (см. task_events.py) попадают в локальный брокер,
+# который раскладывает их по очередям подключенных клиентов. При нескольких воркерах
+# события передаются между процессами через Postgres LISTEN/NOTIFY; без него каждый
+# процесс видит только свои записи.
+
+# Максимум событий в очереди одного подключения. Если клиент не успевает читать,
+# очередь сбрасывается и клиент получает событие resync (перечитать данные)
+CHANGE_FEED_QUEUE_SIZE = int(os.getenv("CHANGE_FEED_QUEUE_SIZE", "100"))
+# Интервал комментариев-keepalive в потоке SSE (держит соединение через прокси)
+CHANGE_FEED_KEEPALIVE_SECONDS = float(os.getenv("CHANGE_FEED_KEEPALIVE_SECONDS", "15"))
+# Прямое подключение к Postgres для LISTEN/NOTIFY (через PgBouncer в transaction mode LISTEN не работает).
+# По умолчанию - DATABASE_URL при DB_CONNECTION_MODE=direct
+CHANGE_FEED_LISTEN_URL = os.getenv("CHANGE_FEED_LISTEN_URL") or (
+    DATABASE_URL if DB_CONNECTION_MODE == "direct" and DATABASE_URL.startswith("postgresql") else None
+)
+CHANGE_FEED_CHANNEL = "task_changes"
+# Максимальный размер NOTIFY - 8000 байт, оставляем запас
+NOTIFY_PAYLOAD_LIMIT = 7500
+# Сколько пачек событий может ждать отправки в NOTIFY
+NOTIFY_OUTBOX_SIZE = 1000
+
+RESYNC_EVENT = {"type": "resync"}
+
+
+class Subscription:
+    """Очередь событий одного подключения"""
+
+    def __init__(self, user: UserPrincipal):
+        self.user_id = user.id
+        self.is_admin = user.role.value == "admin"
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=CHANGE_FEED_QUEUE_SIZE)
+
+    def offer(self, event: dict) -> bool:
+        """Кладет событие без ожидания; False - очередь переполнена и сброшена"""
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            # Медленный клиент не тормозит остальных: вместо накопленных событий - resync
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_EVENT)
+            return False
+
+
+class ChangeFeedBroker:
+    """Локальная раздача событий подписчикам: пользователю - его задачи, администратору - все"""
+
+    def __init__(self):
+        self._by_user: Dict[int, Set[Subscription]] = {}
+        self._admins: Set[Subscription] = set()
+        self.delivered = 0
+        self.overflows = 0
+
+    def subscribe(self, user: UserPrincipal) -> Subscription:
+        subscription = Subscription(user)
+        if subscription.is_admin:
+            self._admins.add(subscription)
+        else:
+            self._by_user.setdefault(user.id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription.is_admin:
+            self._admins.discard(subscription)
+            return
+        subscriptions = self._by_user.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._by_user[subscription.user_id]
+
+    def deliver(self, events: List[dict]) -> None:
+        for event in events:
+            for subscription in (*self._by_user.get(event["user_id"], ()), *self._admins):
+                if subscription.offer(event):
+                    self.delivered += 1
+                else:
+                    self.overflows += 1
+
+    def resync_all(self) -> None:
+        """События могли потеряться (разрыв LISTEN) - все клиенты перечитывают данные"""
+        for subscription in (*(s for group in self._by_user.values() for s in group), *self._admins):
+            subscription.offer(RESYNC_EVENT)
+
+    def stats(self) -> dict:
+        return {
+            "connections": sum(len(group) for group in self._by_user.values()) + len(self._admins),
+            "delivered": self.delivered,
+            "overflows": self.overflows
+        }
+
+
+class LocalFanout:
+    """Доставка только подписчикам этого процесса"""
+
+    def __init__(self, broker: ChangeFeedBroker):
+        self.broker = broker
+
+    def publish(self, events: List[dict]) -> None:
+        self.broker.deliver(events)
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+def _payload_chunks(events: List[dict]) -> Iterator[str]:
+    """Делит события на JSON-массивы, каждый из которых помещается в один NOTIFY"""
+    chunk: List[bytes] = []
+    size = 2
+    for event in events:
+        encoded = dumps(event)
+        if chunk and size + len(encoded) + 1 > NOTIFY_PAYLOAD_LIMIT:
+            yield (b"[" + b",".join(chunk) + b"]").decode()
+            chunk, size = [], 2
+        chunk.append(encoded)
+        size += len(encoded) + 1
+    if chunk:
+        yield (b"[" + b",".join(chunk) + b"]").decode()
+
+
+class PostgresFanout:
+    """
+    Доставка всем процессам через LISTEN/NOTIFY на отдельном соединении asyncpg.
+    Процесс-отправитель получает свои события тем же путем, что и остальные.
+    """
+
+    def __init__(self, broker: ChangeFeedBroker, url: str):
+        self.broker = broker
+        self.dsn = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.connection = None
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=NOTIFY_OUTBOX_SIZE)
+        self.dropped = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def publish(self, events: List[dict]) -> None:
+        # Вызывается после commit в синхронном контексте - только ставим в очередь
+        for payload in _payload_chunks(events):
+            try:
+                self.outbox.put_nowait(payload)
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        self.broker.deliver(orjson.loads(payload))
+
+    async def _connect(self) -> None:
+        import asyncpg
+
+        self.connection = await asyncpg.connect(self.dsn)
+        await self.connection.add_listener(CHANGE_FEED_CHANNEL, self._on_notify)
+
+    async def _reconnect(self) -> None:
+        if self.connection is not None:
+            self.connection.terminate()
+            self.connection = None
+        while self.connection is None:
+            try:
+                await self._connect()
+            except Exception as e:
+                print(f"Лента изменений: нет соединения с Postgres ({e}), повтор через секунду")
+                await asyncio.sleep(1)
+        # Пока соединения не было, уведомления других процессов могли потеряться
+        self.broker.resync_all()
+
+    async def _run(self) -> None:
+        await self._reconnect()
+        while True:
+            try:
+                payload = await asyncio.wait_for(self.outbox.get(), timeout=CHANGE_FEED_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                payload = None
+            try:
+                if payload is None:
+                    # Проверяем, что соединение LISTEN живо
+                    await self.connection.execute("SELECT 1")
+                else:
+                    await self.connection.execute("SELECT pg_notify($1, $2)", CHANGE_FEED_CHANNEL, payload)
+            except Exception as e:
+                print(f"Лента изменений: ошибка соединения LISTEN/NOTIFY ({e}), переподключение")
+                await self._reconnect()
+
+    async def start(self) -> None:
+        # Подключение идет в фоне: недоступный Postgres не задерживает запуск приложения,
+        # а события, зафиксированные до подключения, ждут в outbox
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        if self.connection is not None:
+            await self.connection.close()
+
+
+broker = ChangeFeedBroker()
+fanout = PostgresFanout(broker, CHANGE_FEED_LISTEN_URL) if CHANGE_FEED_LISTEN_URL else LocalFanout(broker)
+on_task_events_committed(fanout.publish)
+
+
+def format_sse(event: dict) -> bytes:
+    return b"event: " + event["type"].encode() + b"\ndata: " + dumps(event) + b"\n\n"
@@ -0,0 +1,165 @@
+import os
+import zlib
+from typing import Dict, Optional
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    # Brotli необязателен (pip install brotli): без него ответы сжимаются только gzip
+    brotli = None
+
+# Сжатие ответов по Accept-Encoding: brotli или gzip, выбор по q-значениям клиента
+# (при равных - brotli). Ответы меньше COMPRESSION_MIN_SIZE байт не сжимаются: выигрыш
+# меньше накладных расходов. Потоковые ответы (выгрузка, stream=true) сжимаются по частям.
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# Качество 4-5 - разумный компромисс между степенью сжатия и CPU для динамических ответов
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "text/csv",
+    "text/plain",
+    "text/html",
+}
+
+
+class GzipEncoder:
+    def __init__(self):
+        # wbits=31 - формат gzip (заголовок и контрольная сумма)
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        """Отдает все сжатое на данный момент: клиент может распаковать часть потока"""
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+# Доступные кодировки в порядке предпочтения сервера
+ENCODERS = {"br": BrotliEncoder, "gzip": GzipEncoder} if brotli else {"gzip": GzipEncoder}
+
+
+def _accepted_encodings(header: str) -> Dict[str, float]:
+    """'gzip;q=0.8, br' -> {'gzip': 0.8, 'br': 1.0}"""
+    accepted = {}
+    for item in header.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+
+def choose_encoding(header: str) -> Optional[str]:
+    """Кодировка ответа по Accept-Encoding (None - без сжатия)"""
+    accepted = _accepted_encodings(header)
+    best, best_quality = None, 0.0
+    for encoding in ENCODERS:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _is_compressible(status: int, headers: MutableHeaders) -> bool:
+    if status < 200 or status in (204, 304) or "content-encoding" in headers:
+        return False
+    # text/event-stream не сжимаем: события должны уходить клиенту сразу
+    content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    return content_type in COMPRESSIBLE_TYPES or content_type.endswith("+json")
+
+
+class CompressionMiddleware:
+    """ASGI-middleware: сжатие ответов в кодировке, которую выбрал клиент"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        start_message = None
+        encoder = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, encoder, passthrough
+            if message["type"] == "http.response.start":
+                # Заголовки отправляются вместе с первой частью тела, когда известен ее размер
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+            if encoder is not None:
+                more_body = message.get("more_body", False)
+                body = encoder.compress(message.get("body", b""))
+                body += encoder.flush() if more_body else encoder.finish()
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+
+            # Первая часть тела: решаем, сжимать ли ответ
+            headers = MutableHeaders(raw=start_message["headers"])
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if not _is_compressible(start_message["status"], headers):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+            # Ответ зависит от Accept-Encoding - это должны учитывать кеши
+            headers.add_vary_header("Accept-Encoding")
+            if encoding is None or (not more_body and len(body) < COMPRESSION_MIN_SIZE):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            encoder = ENCODERS[encoding]()
+            headers["Content-Encoding"] = encoding
+            if more_body:
+                # Размер сжатого потока заранее неизвестен
+                if "content-length" in headers:
+                    del headers["content-length"]
+                body = encoder.compress(body) + encoder.flush()
+            else:
+                body = encoder.compress(body) + encoder.finish()
+                headers["Content-Length"] = str(len(body))
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,278 @@
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select, update, delete, insert, bindparam, Boolean
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Task, TaskTombstone
+from models.task import compute_quadrant, is_urgent
+from schemas import TaskCreate, TaskUpdate
+from serializers import TASK_RESPONSE_COLUMNS
+from user_cache import UserPrincipal
+from task_events import tasks_changed, task_event
+
+# Запись задач за один запрос к БД: проверка владельца стоит в WHERE,
+# измененная строка возвращается через RETURNING.
+
+
+class TaskNotFound(Exception):
+    """Задачи с таким id не существует"""
+
+
+class TaskAccessDenied(Exception):
+    """Задача существует, но принадлежит другому пользователю"""
+
+
+def ownership_conditions(user: UserPrincipal) -> List:
+    """Условия доступа к задачам: администратор видит все, пользователь - только свои"""
+    if user.role.value == "admin":
+        return []
+    return [Task.user_id == user.id]
+
+
+def task_list_query(user: UserPrincipal, *conditions, columns=TASK_RESPONSE_COLUMNS):
+    """SELECT колонок TaskResponse (или набора полей fields=) с учетом прав доступа"""
+    return select(*columns).where(*ownership_conditions(user), *conditions)
+
+
+async def _raise_missing(db: AsyncSession, task_id: int) -> None:
+    """
+    Запись не затронула ни одной строки: отличаем 404 от 403.
+    Дополнительный запрос выполняется только на этом, неуспешном, пути.
+    """
+    result = await db.execute(select(Task.id).where(Task.id == task_id))
+    if result.scalar_one_or_none() is None:
+        raise TaskNotFound()
+    raise TaskAccessDenied()
+
+
+async def _record_tombstones(db: AsyncSession, rows) -> None:
+    """Отметки об удалении задач для GET /tasks/changes (строки с id и user_id), до commit"""
+    values = [
+        {"task_id": row.id, "user_id": row.user_id, "deleted_at": datetime.now(timezone.utc)}
+        for row in rows
+    ]
+    if not values:
+        return
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(TaskTombstone).values(values)
+    # SQLite может выдать id удаленной задачи повторно - отметка обновляется
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=[TaskTombstone.task_id],
+        set_={"user_id": statement.excluded.user_id, "deleted_at": statement.excluded.deleted_at}
+    ))
+
+
+async def _apply_update(
+    db: AsyncSession,
+    task_id: int,
+    user: UserPrincipal,
+    changes: TaskUpdate,
+    now: datetime
+) -> Optional[Task]:
+    """UPDATE ... RETURNING без фиксации транзакции (None - строка не найдена или чужая)"""
+    values = changes.model_dump(exclude_none=True)
+
+    if "completed" in values:
+        values["completed_at"] = now if values["completed"] else None
+    # Квадрант зависит от важности и дедлайна - пересчитываем его тем же UPDATE
+    if "is_important" in values or "deadline_at" in values:
+        values["quadrant"] = Task.quadrant_expression(
+            now,
+            is_important=values.get("is_important"),
+            deadline_at=values.get("deadline_at")
+        )
+
+    if values:
+        statement = (
+            update(Task)
+            .where(Task.id == task_id, *ownership_conditions(user))
+            .values(**values)
+            .returning(Task)
+        )
+    else:
+        statement = select(Task).where(Task.id == task_id, *ownership_conditions(user))
+
+    result = await db.execute(statement)
+    return result.scalar_one_or_none()
+
+
+async def update_task(
+    db: AsyncSession,
+    task_id: int,
+    user: UserPrincipal,
+    changes: TaskUpdate
+) -> Task:
+    task = await _apply_update(db, task_id, user, changes, datetime.now(timezone.utc))
+    if task is None:
+        await _raise_missing(db, task_id)
+
+    await tasks_changed(db, [task.user_id], [task_event("updated", task.id, task.user_id, task.quadrant)])
+    await db.commit()
+    return task
+
+
+async def complete_task(db: AsyncSession, task_id: int, user: UserPrincipal) -> Task:
+    result = await db.execute(
+        update(Task)
+        .where(Task.id == task_id, *ownership_conditions(user))
+        .values(completed=True, completed_at=datetime.now(timezone.utc))
+        .returning(Task)
+    )
+    task = result.scalar_one_or_none()
+    if task is None:
+        await _raise_missing(db, task_id)
+
+    await tasks_changed(db, [task.user_id], [task_event("completed", task.id, task.user_id, task.quadrant)])
+    await db.commit()
+    return task
+
+
+async def delete_task(db: AsyncSession, task_id: int, user: UserPrincipal) -> dict:
+    result = await db.execute(
+        delete(Task)
+        .where(Task.id == task_id, *ownership_conditions(user))
+        .returning(Task.id, Task.title, Task.user_id)
+    )
+    row = result.one_or_none()
+    if row is None:
+        await _raise_missing(db, task_id)
+
+    await _record_tombstones(db, [row])
+    await tasks_changed(db, [row.user_id], [task_event("deleted", row.id, row.user_id)])
+    await db.commit()
+    return {"id": row.id, "title": row.title, "user_id": row.user_id}
+
+
+# Пакетные операции: выполняются в транзакции вызывающего, без commit.
+
+
+async def classify_missing(db: AsyncSession, task_ids: Iterable[int]) -> Dict[int, Exception]:
+    """Для id, которые не затронула пакетная запись, определяет причину одним запросом"""
+    task_ids = set(task_ids)
+    if not task_ids:
+        return {}
+    result = await db.execute(select(Task.id).where(Task.id.in_(task_ids)))
+    existing = set(result.scalars().all())
+    return {
+        task_id: TaskAccessDenied() if task_id in existing else TaskNotFound()
+        for task_id in task_ids
+    }
+
+
+async def create_tasks(
+    db: AsyncSession,
+    user: UserPrincipal,
+    tasks: List[TaskCreate]
+) -> List[Task]:
+    """Многострочный INSERT ... RETURNING, квадранты считаются пачкой до вставки"""
+    if not tasks:
+        return []
+    now = datetime.now(timezone.utc)
+    rows = [
+        {
+            "title": task.title,
+            "description": task.description,
+            "is_important": task.is_important,
+            "deadline_at": task.deadline_at,
+            "quadrant": compute_quadrant(task.is_important, task.deadline_at),
+            "completed": False,
+            "created_at": now,
+            "user_id": user.id
+        }
+        for task in tasks
+    ]
+    result = await db.scalars(
+        insert(Task).returning(Task, sort_by_parameter_order=True),
+        rows
+    )
+    return result.all()
+
+
+async def update_tasks(
+    db: AsyncSession,
+    user: UserPrincipal,
+    changes: List[Tuple[int, TaskUpdate]]
+) -> List[Optional[Task]]:
+    """
+    Обновления с одинаковым набором изменяемых полей выполняются одним UPDATE
+    с executemany (по группе на набор полей), затем все задачи выбираются одним SELECT.
+    None - задача не найдена или чужая. id задач в changes не повторяются.
+    """
+    if not changes:
+        return []
+    now = datetime.now(timezone.utc)
+
+    groups: Dict[Tuple[str, ...], List[dict]] = {}
+    for task_id, task_update in changes:
+        values = task_update.model_dump(exclude_none=True)
+        if not values:
+            continue
+        if "completed" in values:
+            values["completed_at"] = now if values["completed"] else None
+        params = {f"b_{name}": value for name, value in values.items()}
+        params["b_id"] = task_id
+        if "deadline_at" in values:
+            # Срочность нового дедлайна считается здесь, квадрант - в том же UPDATE
+            params["b_urgent"] = is_urgent(values["deadline_at"])
+        groups.setdefault(tuple(sorted(values)), []).append(params)
+
+    # executemany не поддерживает RETURNING для UPDATE - выполняем на уровне Core
+    connection = await db.connection()
+    for columns, params in groups.items():
+        values = {name: bindparam(f"b_{name}") for name in columns}
+        if "is_important" in columns or "deadline_at" in columns:
+            values["quadrant"] = Task.quadrant_expression(
+                now,
+                is_important=bindparam("b_is_important", type_=Boolean) if "is_important" in columns else None,
+                urgent=bindparam("b_urgent", type_=Boolean) if "deadline_at" in columns else None
+            )
+        await connection.execute(
+            update(Task.__table__)
+            .where(Task.id == bindparam("b_id"), *ownership_conditions(user))
+            .values(**values),
+            params
+        )
+
+    result = await db.scalars(
+        select(Task)
+        .where(Task.id.in_([task_id for task_id, _ in changes]), *ownership_conditions(user))
+        .execution_options(populate_existing=True)
+    )
+    tasks = {task.id: task for task in result.all()}
+    return [tasks.get(task_id) for task_id, _ in changes]
+
+
+async def complete_tasks(
+    db: AsyncSession,
+    user: UserPrincipal,
+    task_ids: List[int]
+) -> Dict[int, Task]:
+    if not task_ids:
+        return {}
+    result = await db.scalars(
+        update(Task)
+        .where(Task.id.in_(task_ids), *ownership_conditions(user))
+        .values(completed=True, completed_at=datetime.now(timezone.utc))
+        .returning(Task)
+    )
+    return {task.id: task for task in result.all()}
+
+
+async def delete_tasks(
+    db: AsyncSession,
+    user: UserPrincipal,
+    task_ids: List[int]
+) -> Dict[int, dict]:
+    if not task_ids:
+        return {}
+    result = await db.execute(
+        delete(Task)
+        .where(Task.id.in_(task_ids), *ownership_conditions(user))
+        .returning(Task.id, Task.title, Task.user_id)
+    )
+    rows = result.all()
+    await _record_tombstones(db, rows)
+    return {
+        row.id: {"id": row.id, "title": row.title, "user_id": row.user_id}
+        for row in rows
+    }
@@ -0,0 +1,97 @@
+import hashlib
+from datetime import datetime, timezone
+from typing import Iterable
+from fastapi import Depends, Request
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from dependencies import get_current_user, get_read_session
+from models import UserDataVersion, GlobalDataVersion
+from user_cache import UserPrincipal
+
+
+class NotModified(Exception):
+    """Данные клиента актуальны - ответ 304 без тела"""
+
+    def __init__(self, etag: str):
+        self.etag = etag
+
+
+async def bump_versions(db: AsyncSession, user_ids: Iterable[int]) -> None:
+    """
+    Увеличивает версии данных пользователей и общую версию. Вызывается в транзакции
+    записи задач до commit. Ключи сортируются, а общая строка блокируется последней,
+    чтобы параллельные транзакции блокировали строки в одном порядке.
+    """
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(UserDataVersion).values(
+        [{"user_id": user_id, "version": 1} for user_id in user_ids]
+    )
+    await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[UserDataVersion.user_id],
+            set_={"version": UserDataVersion.version + 1}
+        )
+    )
+    await db.execute(
+        dialect.insert(GlobalDataVersion).values(id=1, version=1).on_conflict_do_update(
+            index_elements=[GlobalDataVersion.id],
+            set_={"version": GlobalDataVersion.version + 1}
+        )
+    )
+
+
+async def current_version(db: AsyncSession, user: UserPrincipal) -> str:
+    """Версия данных, видимых пользователю (для администратора - по всем пользователям)"""
+    if user.role.value == "admin":
+        # Общий счетчик только растет: в отличие от суммы счетчиков пользователей,
+        # его значение не повторяется после удаления строк
+        result = await db.execute(select(GlobalDataVersion.version).where(GlobalDataVersion.id == 1))
+        return f"all.{result.scalar_one_or_none() or 0}"
+
+    result = await db.execute(
+        select(UserDataVersion.version).where(UserDataVersion.user_id == user.id)
+    )
+    return f"user{user.id}.{result.scalar_one_or_none() or 0}"
+
+
+# В ответах есть days_remaining, который меняется со временем без записи в БД,
+# поэтому ETag дополнительно меняется раз в ETAG_TIME_BUCKET_SECONDS
+# (days_remaining в ответе 304 может отставать не больше чем на этот интервал)
+ETAG_TIME_BUCKET_SECONDS = 3600
+
+
+def make_etag(request: Request, version: str) -> str:
+    bucket = int(datetime.now(timezone.utc).timestamp()) // ETAG_TIME_BUCKET_SECONDS
+    url_hash = hashlib.sha1(f"{request.url.path}?{request.url.query}".encode()).hexdigest()[:12]
+    return f'W/"{version}.{bucket}.{url_hash}"'
+
+
+def _if_none_match(request: Request) -> list:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return []
+    return [tag.strip() for tag in header.split(",")]
+
+
+async def task_data_etag(
+    request: Request,
+    db: AsyncSession = Depends(get_read_session),
+    current_user: UserPrincipal = Depends(get_current_user)
+) -> str:
+    """
+    Зависимость для GET-обработчиков: вычисляет ETag по версии данных пользователя
+    и прерывает запрос ответом 304, если у клиента актуальная копия.
+    Версия читается в той же сессии, что и данные обработчика (зависимость кешируется
+    на запрос): при чтении из реплики версия не может оказаться новее отданных данных,
+    иначе устаревшее тело закешировалось бы под новым ETag.
+    """
+    etag = make_etag(request, await current_version(db, current_user))
+    candidates = _if_none_match(request)
+    if "*" in candidates or etag in candidates:
+        raise NotModified(etag)
+    return etag
@@ -1,20 +1,178 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
-from typing import AsyncGenerator
+from sqlalchemy.types import TypeDecorator, DateTime
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.util.queue import AsyncAdaptedQueue
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError, DBAPIError
+from typing import AsyncGenerator, Dict, Optional
+from datetime import datetime, timezone
 import os
+import time
 from dotenv import load_dotenv
 
 class Base(DeclarativeBase):
     pass
 
+
+class UTCDateTime(TypeDecorator):
+    """
+    DateTime(timezone=True), который всегда возвращает время с часовым поясом UTC.
+    Postgres хранит часовой пояс сам, SQLite - нет: в него пишется время UTC,
+    а прочитанное время без пояса считается UTC.
+    """
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value: Optional[datetime], dialect) -> Optional[datetime]:
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value
+
+    def process_result_value(self, value: Optional[datetime], dialect) -> Optional[datetime]:
+        if value is not None and value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_async_engine(
-    DATABASE_URL,
-    connect_args={"statement_cache_size": 0}
-)
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+# Настройки пула соединений
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # секунд, -1 - не пересоздавать
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", False)
+
+# Режим подключения к Postgres:
+# - direct: напрямую к серверу, кеш prepared statements asyncpg включен
+# - pgbouncer: через PgBouncer в transaction mode (например, пулер Supabase), где
+#   prepared statements нельзя переиспользовать между транзакциями - кеш отключен
+DB_CONNECTION_MODE = os.getenv("DB_CONNECTION_MODE", "pgbouncer")
+if DB_CONNECTION_MODE not in ("direct", "pgbouncer"):
+    raise RuntimeError("DB_CONNECTION_MODE должен быть direct или pgbouncer")
+
+
+class PoolStats:
+    """Счетчики выдачи соединений из пула и времени ожидания свободного соединения"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.checkins = 0
+        self.timeouts = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+
+    def record_wait(self, wait_ms: float) -> None:
+        self.wait_total_ms += wait_ms
+        self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+
+    def as_dict(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": round(self.wait_total_ms / self.checkouts, 3) if self.checkouts else None,
+            "wait_max_ms": round(self.wait_max_ms, 3)
+        }
+
+
+class TimedAsyncQueue(AsyncAdaptedQueue):
+    """Очередь свободных соединений пула, замеряющая ожидание в ней"""
+    stats: Optional[PoolStats] = None
+
+    def get(self, block: bool = True, timeout: Optional[float] = None):
+        started = time.perf_counter()
+        try:
+            return super().get(block, timeout)
+        finally:
+            if self.stats is not None:
+                self.stats.record_wait((time.perf_counter() - started) * 1000)
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """
+    Пул со счетчиками выдачи соединений. Замеряется только ожидание свободного
+    соединения в очереди, установка нового соединения в ожидание не входит.
+    """
+    _queue_class = TimedAsyncQueue
+
+    def __init__(self, *args, stats: Optional[PoolStats] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._use_stats(stats or PoolStats())
+
+    def _use_stats(self, stats: PoolStats) -> None:
+        self.stats = stats
+        self._pool.stats = stats
+
+    def recreate(self) -> "InstrumentedAsyncPool":
+        # engine.dispose() пересоздает пул: счетчики продолжаются в новом
+        pool = super().recreate()
+        pool._use_stats(self.stats)
+        return pool
+
+    def connect(self):
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self.stats.timeouts += 1
+            raise
+        self.stats.checkouts += 1
+        return connection
+
+    def _do_return_conn(self, record) -> None:
+        self.stats.checkins += 1
+        super()._do_return_conn(record)
+
+
+# Статистика пулов по имени движка (см. /admin/db/pool)
+pool_stats: Dict[str, PoolStats] = {}
+
+def _create_engine(url: str, name: str) -> AsyncEngine:
+    options = {}
+    if not url.startswith("sqlite"):
+        options.update(
+            poolclass=InstrumentedAsyncPool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING
+        )
+    if "+asyncpg" in url and DB_CONNECTION_MODE == "pgbouncer":
+        options["connect_args"] = {"statement_cache_size": 0}
+    async_engine = create_async_engine(url, **options)
+    pool = async_engine.sync_engine.pool
+    if isinstance(pool, InstrumentedAsyncPool):
+        pool_stats[name] = pool.stats
+    return async_engine
+
+def describe_pool(engine: AsyncEngine, name: str) -> dict:
+    pool = engine.sync_engine.pool
+    info = {
+        "pool_class": type(pool).__name__,
+        "status": pool.status(),
+        "connection_mode": DB_CONNECTION_MODE
+    }
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        info.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            checked_in=pool.checkedin(),
+            max_overflow=DB_MAX_OVERFLOW,
+            timeout=DB_POOL_TIMEOUT,
+            recycle=DB_POOL_RECYCLE,
+            pre_ping=DB_POOL_PRE_PING
+        )
+    if name in pool_stats:
+        info["stats"] = pool_stats[name].as_dict()
+    return info
+
+engine = _create_engine(DATABASE_URL, "primary")
 
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
@@ -22,9 +180,64 @@ AsyncSessionLocal = async_sessionmaker(
     expire_on_commit=False
 )
 
+# Необязательная реплика для чтения. Если не задана, все запросы идут в основную БД
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+read_engine = _create_engine(DATABASE_READ_URL, "replica") if DATABASE_READ_URL else None
+
+AsyncReadSessionLocal = async_sessionmaker(
+    bind=read_engine,
+    autoflush=False,
+    expire_on_commit=False
+) if read_engine is not None else None
+
+# После записи чтения пользователя какое-то время идут в основную БД,
+# чтобы он увидел свои изменения, даже если реплика отстает
+STICKY_PRIMARY_SECONDS = float(os.getenv("STICKY_PRIMARY_SECONDS", "5"))
+_sticky_until: Dict[int, float] = {}
+_any_write_sticky_until = 0.0
+
+def mark_primary_sticky(user_ids) -> None:
+    """Закрепляет чтения пользователей за основной БД (на уровне процесса)"""
+    global _any_write_sticky_until
+    until = time.monotonic() + STICKY_PRIMARY_SECONDS
+    _any_write_sticky_until = until
+    for user_id in user_ids:
+        _sticky_until[user_id] = until
+    # Не даем словарю расти: убираем истекшие записи
+    if len(_sticky_until) > 10000:
+        now = time.monotonic()
+        for user_id in [u for u, t in _sticky_until.items() if t < now]:
+            del _sticky_until[user_id]
+
+def is_primary_sticky(user_id: Optional[int], is_admin: bool = False) -> bool:
+    # Администратор читает задачи всех пользователей, поэтому учитывается любая запись
+    until = _any_write_sticky_until if is_admin else _sticky_until.get(user_id, 0.0)
+    return time.monotonic() < until
+
+# Применять миграции при запуске приложения, если схема устарела.
+# Воркеры, запущенные одновременно, мигрируют по очереди под блокировкой (см. migrations.py).
+# В продакшене лучше выключить и выполнять python migrate.py перед выкладкой
+DB_AUTO_MIGRATE = _env_bool("DB_AUTO_MIGRATE", True)
+
 async def init_db():
+    from migrations import LATEST_VERSION, read_schema_version, run_migrations
+
+    # Быстрый путь: схема актуальна - один запрос вместо DDL и обращений к каталогу
+    try:
+        async with engine.connect() as conn:
+            version = await read_schema_version(conn)
+    except DBAPIError:
+        version = 0  # таблицы schema_version еще нет
+    if version >= LATEST_VERSION:
+        print(f"Схема БД актуальна (версия {version})")
+        return
+
+    if not DB_AUTO_MIGRATE:
+        raise RuntimeError(
+            f"Схема БД устарела (версия {version}, нужна {LATEST_VERSION}): выполните python migrate.py"
+        )
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await run_migrations(conn)
     print("База данных инициализирована!")
 
 async def drop_db():
@@ -34,4 +247,4 @@ async def drop_db():
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
@@ -0,0 +1,107 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+from sqlalchemy import select, delete, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Task, TaskTombstone
+from crud import ownership_conditions
+from pagination import encode_cursor
+from serializers import fieldset_columns, project_rows
+from user_cache import UserPrincipal
+
+# Дельта-синхронизация (GET /tasks/changes): клиент хранит курсор и получает только
+# задачи, измененные после него (по updated_at), и id удаленных (по task_tombstones).
+# Курсор - пара (время изменения, id) последней отданной записи, закодированная как в pagination.py.
+#
+# Время изменения ставится до commit, поэтому долгая транзакция может зафиксироваться
+# позже уже выданного курсора с более ранним временем (так же отстает и реплика чтения).
+# Чтобы такие записи не терялись, курсор "все получено" не бывает новее, чем
+# CHANGES_SETTLE_SECONDS назад: изменения последних секунд придут повторно, клиент
+# применяет их идемпотентно (по id).
+CHANGES_SETTLE_SECONDS = float(os.getenv("CHANGES_SETTLE_SECONDS", "10"))
+# Сколько дней хранятся отметки об удалении. Курсор старше - только полная синхронизация
+TOMBSTONE_RETENTION_DAYS = int(os.getenv("TOMBSTONE_RETENTION_DAYS", "30"))
+
+
+class CursorExpired(Exception):
+    """Курсор старше срока хранения отметок об удалении: часть удалений уже не восстановить"""
+
+
+def _tombstone_conditions(user: UserPrincipal) -> List:
+    if user.role.value == "admin":
+        return []
+    return [TaskTombstone.user_id == user.id]
+
+
+async def purge_tombstones(db: AsyncSession) -> int:
+    """Удаляет отметки старше TOMBSTONE_RETENTION_DAYS"""
+    horizon = datetime.now(timezone.utc) - timedelta(days=TOMBSTONE_RETENTION_DAYS)
+    result = await db.execute(delete(TaskTombstone).where(TaskTombstone.deleted_at < horizon))
+    await db.commit()
+    return result.rowcount
+
+
+async def load_changes(
+    db: AsyncSession,
+    user: UserPrincipal,
+    since: Optional[Tuple[datetime, int]],
+    limit: int,
+    fields: Optional[Tuple[str, ...]] = None
+) -> dict:
+    """
+    Страница изменений после курсора since (None - с самого начала, полная синхронизация).
+    Задачи и удаления выбираются двумя keyset-запросами и сливаются по (время, id).
+    """
+    now = datetime.now(timezone.utc)
+    if since is not None and since[0].tzinfo is None:
+        # Курсоры хранят время UTC; время без пояса - из курсоров старого формата
+        since = (since[0].replace(tzinfo=timezone.utc), since[1])
+    if since is not None and since[0] < now - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+        raise CursorExpired()
+
+    task_query = select(*fieldset_columns(fields, Task.id, Task.updated_at)).where(*ownership_conditions(user))
+    tombstone_query = select(TaskTombstone.task_id, TaskTombstone.deleted_at).where(
+        *_tombstone_conditions(user)
+    )
+    if since is not None:
+        task_query = task_query.where(tuple_(Task.updated_at, Task.id) > tuple_(*since))
+        tombstone_query = tombstone_query.where(
+            tuple_(TaskTombstone.deleted_at, TaskTombstone.task_id) > tuple_(*since)
+        )
+
+    # Первые limit записей слияния заведомо входят в первые limit + 1 записей каждого потока
+    tasks = (await db.execute(
+        task_query.order_by(Task.updated_at, Task.id).limit(limit + 1)
+    )).all()
+    tombstones = (await db.execute(
+        tombstone_query.order_by(TaskTombstone.deleted_at, TaskTombstone.task_id).limit(limit + 1)
+    )).all()
+
+    entries = sorted(
+        [(row.updated_at, row.id, row) for row in tasks]
+        + [(row.deleted_at, row.task_id, None) for row in tombstones],
+        key=lambda entry: (entry[0], entry[1])
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    changed_rows = [row for _, _, row in entries if row is not None]
+    changed = project_rows(changed_rows, fields)
+    for data, row in zip(changed, changed_rows):
+        # id и время изменения нужны клиенту при любом наборе полей fields=
+        data["id"] = row.id
+        data["updated_at"] = row.updated_at
+    deleted = [task_id for _, task_id, row in entries if row is None]
+
+    cursor = (entries[-1][0], entries[-1][1]) if entries else since
+    if not has_more:
+        settled = now - timedelta(seconds=CHANGES_SETTLE_SECONDS)
+        if cursor is None or cursor[0] > settled:
+            cursor = (settled, 0)
+
+    return {
+        "changed": changed,
+        "deleted": deleted,
+        "next_cursor": encode_cursor(*cursor),
+        "has_more": has_more
+    }
@@ -1,11 +1,12 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from database import get_async_session
+from database import get_async_session, AsyncReadSessionLocal, is_primary_sticky
 from models import User, UserRole
 from auth_utils import decode_access_token
-from typing import Optional
+from user_cache import UserPrincipal, user_cache
+from typing import AsyncGenerator, Optional
 
 # OAuth2 схема для получения токена из заголовка Authorization
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v3/auth/login")
@@ -14,7 +15,7 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v3/auth/login")
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: AsyncSession = Depends(get_async_session)
-) -> User:
+) -> UserPrincipal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Не удалось проверить учетные данные",
@@ -29,7 +30,11 @@ async def get_current_user(
     if user_id is None:
         raise credentials_exception
 
-    # Поиск пользователя в БД
+    # Сначала ищем пользователя в кеше, в БД идем только при промахе
+    principal = user_cache.get(int(user_id))
+    if principal is not None:
+        return principal
+
     result = await db.execute(
         select(User).where(User.id == int(user_id))
     )
@@ -38,15 +43,38 @@ async def get_current_user(
     if user is None:
         raise credentials_exception
 
-    return user
+    principal = UserPrincipal.from_user(user)
+    user_cache.put(principal)
+    return principal
 
-# Авторизация, возвращает объект User, асли пользователь является администратором
+# Авторизация, возвращает объект UserPrincipal, асли пользователь является администратором
 async def get_current_admin(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: UserPrincipal = Depends(get_current_user)
+) -> UserPrincipal:
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Недостаточно прав доступа"
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+# Сессия для обработчиков, которые только читают данные.
+# Идет в реплику, если она настроена и пользователь недавно ничего не записывал;
+# иначе возвращается та же сессия основной БД, что и у остальных зависимостей запроса
+async def get_read_session(
+    request: Request,
+    primary: AsyncSession = Depends(get_async_session)
+) -> AsyncGenerator[AsyncSession, None]:
+    if AsyncReadSessionLocal is None:
+        yield primary
+        return
+
+    payload = decode_access_token(request.headers.get("authorization", "").removeprefix("Bearer ").strip())
+    user_id = payload.get("sub") if payload else None
+    is_admin = payload.get("role") == UserRole.ADMIN.value if payload else False
+    if user_id is None or is_primary_sticky(int(user_id), is_admin):
+        yield primary
+        return
+
+    async with AsyncReadSessionLocal() as session:
+        yield session
@@ -0,0 +1,243 @@
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+from sqlalchemy import select, update, or_, case, func, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from database import engine, DB_CONNECTION_MODE
+from models import SchedulerLease
+
+# Выбор лидера планировщика среди воркеров uvicorn: задания по расписанию выполняет
+# только лидер. Каждый процесс раз в LEADER_HEARTBEAT_SECONDS пытается захватить
+# или продлить лидерство; если лидер умер, его место занимает другой процесс.
+
+LEADER_LEASE_SECONDS = float(os.getenv("LEADER_LEASE_SECONDS", "30"))
+LEADER_HEARTBEAT_SECONDS = float(os.getenv("LEADER_HEARTBEAT_SECONDS", "10"))
+# Ключ advisory-блокировки Postgres (любое число, общее для всех воркеров приложения)
+LEADER_LOCK_KEY = int(os.getenv("LEADER_LOCK_KEY", "7418529630"))
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+LEASE_NAME = "scheduler"
+
+
+class LeaderBackend:
+    """Механизм лидерства: захват/продление, освобождение и сведения о текущем лидере"""
+
+    async def acquire(self) -> bool:
+        """Захватывает или продлевает лидерство; True - этот процесс лидер"""
+        raise NotImplementedError
+
+    async def release(self) -> None:
+        raise NotImplementedError
+
+    async def describe(self) -> dict:
+        raise NotImplementedError
+
+
+class LeaseBackend(LeaderBackend):
+    """
+    Строка аренды с истечением (scheduler_leases): работает с любой СУБД, в том числе
+    через PgBouncer и на SQLite. Лидер, переставший продлевать аренду, теряет ее
+    через LEADER_LEASE_SECONDS.
+    """
+
+    def __init__(self, async_engine: AsyncEngine):
+        self.engine = async_engine
+
+    def _db_now(self, offset_seconds: float = 0):
+        """
+        Текущее время по часам БД (UTC): сроки аренды всех процессов считаются по одним
+        часам, расхождение часов серверов приложения не отдает лидерство двум процессам
+        """
+        if self.engine.dialect.name == "postgresql":
+            return func.now() + timedelta(seconds=offset_seconds)
+        # Формат совпадает с тем, как SQLAlchemy хранит DateTime в SQLite
+        return func.strftime("%Y-%m-%d %H:%M:%f000", "now", f"{offset_seconds:+f} seconds")
+
+    async def acquire(self) -> bool:
+        now = self._db_now()
+        dialect = postgresql if self.engine.dialect.name == "postgresql" else sqlite
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                dialect.insert(SchedulerLease).values(name=LEASE_NAME).on_conflict_do_nothing()
+            )
+            # Условный UPDATE атомарен: аренду получает только один из конкурирующих процессов
+            result = await conn.execute(
+                update(SchedulerLease)
+                .where(
+                    SchedulerLease.name == LEASE_NAME,
+                    or_(
+                        SchedulerLease.holder == WORKER_ID,
+                        SchedulerLease.holder.is_(None),
+                        SchedulerLease.expires_at < now
+                    )
+                )
+                .values(
+                    holder=WORKER_ID,
+                    acquired_at=case(
+                        (SchedulerLease.holder == WORKER_ID, SchedulerLease.acquired_at),
+                        else_=now
+                    ),
+                    expires_at=self._db_now(LEADER_LEASE_SECONDS)
+                )
+            )
+            return result.rowcount == 1
+
+    async def release(self) -> None:
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.name == LEASE_NAME, SchedulerLease.holder == WORKER_ID)
+                .values(holder=None, acquired_at=None, expires_at=None)
+            )
+
+    async def describe(self) -> dict:
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                select(SchedulerLease.holder, SchedulerLease.acquired_at, SchedulerLease.expires_at)
+                .where(SchedulerLease.name == LEASE_NAME)
+            )
+            row = result.one_or_none()
+        return {
+            "mechanism": "lease",
+            "holder": row.holder if row else None,
+            "acquired_at": row.acquired_at if row else None,
+            "expires_at": row.expires_at if row else None
+        }
+
+
+class AdvisoryLockBackend(LeaderBackend):
+    """
+    Сессионная advisory-блокировка Postgres на отдельном соединении, которое лидер держит открытым.
+    Если процесс умер, соединение рвется и блокировка снимается сразу, без ожидания истечения.
+    Только для прямого подключения: PgBouncer в transaction mode не сохраняет сессию.
+    """
+
+    def __init__(self, async_engine: AsyncEngine):
+        self.engine = async_engine
+        self.connection: Optional[AsyncConnection] = None
+
+    async def acquire(self) -> bool:
+        if self.connection is not None:
+            try:
+                # Соединение живо - блокировка по-прежнему наша
+                await self.connection.execute(text("SELECT 1"))
+                return True
+            except Exception:
+                await self._close()
+                raise
+
+        connection = await self.engine.connect()
+        try:
+            await connection.execution_options(isolation_level="AUTOCOMMIT")
+            result = await connection.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": LEADER_LOCK_KEY}
+            )
+            if result.scalar():
+                self.connection = connection
+                return True
+        except Exception:
+            await connection.close()
+            raise
+        await connection.close()
+        return False
+
+    async def release(self) -> None:
+        if self.connection is None:
+            return
+        try:
+            await self.connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LEADER_LOCK_KEY})
+        finally:
+            await self._close()
+
+    async def _close(self) -> None:
+        connection, self.connection = self.connection, None
+        try:
+            await connection.close()
+        except Exception:
+            pass
+
+    async def describe(self) -> dict:
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                text(
+                    "SELECT pid FROM pg_locks WHERE locktype = 'advisory' AND granted "
+                    "AND ((classid::bigint << 32) | objid::bigint) = :key"
+                ),
+                {"key": LEADER_LOCK_KEY}
+            )
+            pid = result.scalar()
+        return {"mechanism": "advisory_lock", "lock_key": LEADER_LOCK_KEY, "holder_backend_pid": pid}
+
+
+def get_leader_backend(async_engine: AsyncEngine) -> LeaderBackend:
+    if async_engine.dialect.name == "postgresql" and DB_CONNECTION_MODE == "direct":
+        return AdvisoryLockBackend(async_engine)
+    return LeaseBackend(async_engine)
+
+
+class LeaderElection:
+    """Состояние лидерства этого процесса и реакция на его смену"""
+
+    def __init__(self, backend: LeaderBackend):
+        self.backend = backend
+        self.is_leader = False
+        self.leader_since: Optional[datetime] = None
+        self.last_heartbeat: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        # Вызываются при получении и потере лидерства (задаются планировщиком)
+        self.on_elected: Optional[Callable[[], Awaitable[None]]] = None
+        self.on_demoted: Optional[Callable[[], Awaitable[None]]] = None
+
+    async def heartbeat(self) -> bool:
+        """Захват или продление лидерства; вызывается периодически каждым процессом"""
+        try:
+            held = await self.backend.acquire()
+            self.last_error = None
+        except Exception as e:
+            # БД недоступна - считаем, что лидерство потеряно: другой процесс может его забрать
+            held = False
+            self.last_error = str(e)
+            print(f"Ошибка выбора лидера планировщика: {e}")
+        self.last_heartbeat = datetime.now(timezone.utc)
+
+        if held and not self.is_leader:
+            self.is_leader = True
+            self.leader_since = self.last_heartbeat
+            print(f"Процесс {WORKER_ID} стал лидером планировщика")
+            if self.on_elected:
+                await self.on_elected()
+        elif not held and self.is_leader:
+            self.is_leader = False
+            self.leader_since = None
+            print(f"Процесс {WORKER_ID} потерял лидерство планировщика")
+            if self.on_demoted:
+                await self.on_demoted()
+        return held
+
+    async def release(self) -> None:
+        """Отдает лидерство при остановке, чтобы другой процесс подхватил его без ожидания"""
+        if not self.is_leader:
+            return
+        self.is_leader = False
+        self.leader_since = None
+        try:
+            await self.backend.release()
+        except Exception as e:
+            print(f"Не удалось освободить лидерство планировщика: {e}")
+
+    async def status(self) -> dict:
+        return {
+            "worker_id": WORKER_ID,
+            "is_leader": self.is_leader,
+            "leader_since": self.leader_since,
+            "last_heartbeat": self.last_heartbeat,
+            "last_error": self.last_error,
+            "lease_seconds": LEADER_LEASE_SECONDS,
+            "heartbeat_seconds": LEADER_HEARTBEAT_SECONDS,
+            "leader": await self.backend.describe()
+        }
+
+
+leader_election = LeaderElection(get_leader_backend(engine))
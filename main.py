@@ -1,27 +1,60 @@
-from fastapi import FastAPI, Depends
+import time
+# Время запуска по фазам: отсчет импортов начинается до загрузки модулей приложения
+_imports_started = time.perf_counter()
+
+from fastapi import FastAPI, Depends, Request, status
+from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
 from database import init_db, get_async_session
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, text
 from routers import tasks, stats, auth, admin
 from scheduler import start_scheduler, stop_scheduler
+from leader import leader_election
+import change_feed
+from auth_utils import PasswordHasherBusy
+from data_versions import NotModified
+from metrics import MetricsMiddleware, render_metrics, PROMETHEUS_CONTENT_TYPE, startup_seconds
+from query_budget import QueryDebugMiddleware, QUERY_DEBUG
+from compression import CompressionMiddleware
+
+IMPORTS_SECONDS = time.perf_counter() - _imports_started
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # При запуске приложения
     print("Запуск приложения")
+    startup_seconds["imports"] = IMPORTS_SECONDS
     
-    # Инициализируем БД
+    # Инициализируем БД (при актуальной схеме - одна проверка версии)
+    phase_started = time.perf_counter()
     await init_db()
+    startup_seconds["db"] = time.perf_counter() - phase_started
     
-    # Запускаем планировщик
+    # Запускаем планировщик и пробуем стать лидером: задания по расписанию
+    # и таймеры срочности всех задач достаются только одному воркеру
+    phase_started = time.perf_counter()
     start_scheduler()
+    await leader_election.heartbeat()
+    startup_seconds["scheduler"] = time.perf_counter() - phase_started
+
+    # Лента изменений задач (SSE): LISTEN/NOTIFY между воркерами или локальный брокер
+    phase_started = time.perf_counter()
+    await change_feed.fanout.start()
+    startup_seconds["change_feed"] = time.perf_counter() - phase_started
+
+    print(
+        f"Приложение запущено за {sum(startup_seconds.values()) * 1000:.0f} мс: "
+        + ", ".join(f"{phase} {seconds * 1000:.0f} мс" for phase, seconds in startup_seconds.items())
+    )
     
     yield  # Здесь приложение работает
     
     # При завершении работы приложения
     print("Завершение работы приложения")
+    await change_feed.fanout.stop()
+    await leader_election.release()
     stop_scheduler()
     print("Приложение завершило работу")
 
@@ -35,6 +68,35 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Пул хеширования паролей перегружен - просим клиента повторить запрос позже
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Сервис перегружен, повторите попытку позже"},
+        headers={"Retry-After": "1"}
+    )
+
+# Данные клиента не изменились с прошлого запроса - 304 без тела
+@app.exception_handler(NotModified)
+async def not_modified_handler(request: Request, exc: NotModified) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": exc.etag}
+    )
+
+# Сжатие ответов gzip/brotli по Accept-Encoding. Подключается первой, чтобы время
+# сжатия входило в задержку, которую измеряет MetricsMiddleware
+app.add_middleware(CompressionMiddleware)
+
+# Отладка запросов к БД: повторяющиеся запросы и превышение бюджета (QUERY_DEBUG=true).
+# Подключается до MetricsMiddleware, чтобы оказаться внутри нее
+if QUERY_DEBUG:
+    app.add_middleware(QueryDebugMiddleware)
+
+# Метрики задержки и работы с БД по маршрутам (см. GET /metrics)
+app.add_middleware(MetricsMiddleware)
+
 # Подключаем роутеры
 app.include_router(tasks.router, prefix="/api/v3")
 app.include_router(stats.router, prefix="/api/v3")
@@ -51,6 +113,11 @@ async def read_root() -> dict:
         "redoc": "/redoc",
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    """Метрики процесса в текстовом формате Prometheus"""
+    return Response(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 @app.get("/health")
 async def health_check(
     db: AsyncSession = Depends(get_async_session)
@@ -0,0 +1,291 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from database import engine, read_engine, pool_stats
+
+# Метрики в формате Prometheus (GET /metrics): задержка запросов по шаблону маршрута,
+# число запросов к БД и время в БД на HTTP-запрос, ожидание соединения из пула,
+# длительность заданий планировщика. Все счетчики - в памяти процесса, без блокировок
+# (обновляются из цикла событий), каждый воркер отдает свои значения.
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+JOB_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+# Подключения SSE (GET /tasks/events) длятся минутами и часами
+STREAM_BUCKETS = (1.0, 10.0, 60.0, 300.0, 900.0, 1800.0, 3600.0, 7200.0, 21600.0)
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами (значение попадает в первую границу >= value)"""
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        index = bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+
+    def render(self, name: str, labels: str) -> List[str]:
+        prefix = f"{labels}," if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+
+class RequestStats:
+    """Запросы к БД в рамках одного HTTP-запроса"""
+    __slots__ = ("queries", "db_seconds", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        # Тексты запросов со счетчиками - только в отладочном режиме (см. query_budget.py)
+        self.statements: Optional[Dict[str, int]] = None
+
+
+# Статистика текущего HTTP-запроса (None - код выполняется вне запроса, например в планировщике)
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+# (method, route) -> ...
+request_latency: Dict[Tuple[str, str], Histogram] = {}
+request_queries: Dict[Tuple[str, str], Histogram] = {}
+request_db_seconds: Dict[Tuple[str, str], float] = {}
+# Длительность подключений text/event-stream - отдельно от задержки обычных запросов
+stream_duration: Dict[Tuple[str, str], Histogram] = {}
+# (method, route, status) -> количество
+request_total: Dict[Tuple[str, str, int], int] = {}
+# engine -> ...
+db_queries_total: Dict[str, int] = {}
+db_seconds_total: Dict[str, float] = {}
+# job -> ...
+job_duration: Dict[str, Histogram] = {}
+job_rows_total: Dict[str, int] = {}
+job_failures_total: Dict[str, int] = {}
+# Фаза запуска (imports, db, scheduler) -> длительность, заполняется в main.lifespan
+startup_seconds: Dict[str, float] = {}
+
+
+def instrument_engine(async_engine: AsyncEngine, name: str) -> None:
+    """Подключает замер времени каждого запроса к БД (события курсора SQLAlchemy)"""
+    db_queries_total.setdefault(name, 0)
+    db_seconds_total.setdefault(name, 0.0)
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(async_engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        db_queries_total[name] += 1
+        db_seconds_total[name] += elapsed
+        stats = current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+            if stats.statements is not None:
+                stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+    @event.listens_for(async_engine.sync_engine, "handle_error")
+    def handle_error(exception_context):
+        # Запрос упал - after_cursor_execute не будет, убираем его отметку времени
+        started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+        if started:
+            started.pop()
+
+
+instrument_engine(engine, "primary")
+if read_engine is not None:
+    instrument_engine(read_engine, "replica")
+
+
+def record_job(job: str, seconds: float, rows: int, failed: bool = False) -> None:
+    """Длительность и число обработанных строк задания планировщика"""
+    histogram = job_duration.get(job)
+    if histogram is None:
+        histogram = job_duration[job] = Histogram(JOB_BUCKETS)
+    histogram.observe(seconds)
+    job_rows_total[job] = job_rows_total.get(job, 0) + rows
+    if failed:
+        job_failures_total[job] = job_failures_total.get(job, 0) + 1
+
+
+# endpoint -> шаблон маршрута (строится при первом запросе)
+_endpoint_paths: Dict[object, str] = {}
+
+
+def route_template(scope) -> str:
+    """Шаблон маршрута (/api/v3/tasks/{task_id}), а не фактический путь - чтобы метки не размножались"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if not _endpoint_paths and "app" in scope:
+        for app_route in scope["app"].routes:
+            endpoint = getattr(app_route, "endpoint", None)
+            if endpoint is not None:
+                _endpoint_paths.setdefault(endpoint, app_route.path)
+    return _endpoint_paths.get(scope.get("endpoint"), "unmatched")
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: время запроса до отправки последнего байта тела и работа с БД за запрос"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status_code = 500
+        event_stream = False
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code, event_stream
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                for name, value in message.get("headers", ()):
+                    if name.lower() == b"content-type":
+                        event_stream = value.split(b";")[0].strip().lower() == b"text/event-stream"
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_request.reset(token)
+            _record_request(
+                scope["method"], route_template(scope), status_code,
+                time.perf_counter() - started, stats, event_stream
+            )
+
+
+def _record_request(
+    method: str,
+    route: str,
+    status_code: int,
+    seconds: float,
+    stats: RequestStats,
+    event_stream: bool = False
+) -> None:
+    key = (method, route)
+    if key not in request_queries:
+        request_queries[key] = Histogram(QUERY_COUNT_BUCKETS)
+        request_db_seconds[key] = 0.0
+    if event_stream:
+        # Время жизни подключения SSE - не задержка ответа, в гистограмму задержек не попадает
+        duration = stream_duration.get(key)
+        if duration is None:
+            duration = stream_duration[key] = Histogram(STREAM_BUCKETS)
+        duration.observe(seconds)
+    else:
+        latency = request_latency.get(key)
+        if latency is None:
+            latency = request_latency[key] = Histogram(LATENCY_BUCKETS)
+        latency.observe(seconds)
+    request_queries[key].observe(stats.queries)
+    request_db_seconds[key] += stats.db_seconds
+    status_key = (method, route, status_code)
+    request_total[status_key] = request_total.get(status_key, 0) + 1
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def _section(lines: List[str], name: str, kind: str, help_text: str) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def render_metrics() -> str:
+    """Текстовый формат Prometheus"""
+    lines: List[str] = []
+
+    _section(lines, "http_request_duration_seconds", "histogram", "Время обработки HTTP-запроса")
+    for (method, route), histogram in request_latency.items():
+        lines += histogram.render("http_request_duration_seconds", _labels(method=method, route=route))
+
+    _section(lines, "http_stream_duration_seconds", "histogram", "Длительность потоковых подключений (SSE)")
+    for (method, route), histogram in stream_duration.items():
+        lines += histogram.render("http_stream_duration_seconds", _labels(method=method, route=route))
+
+    _section(lines, "http_requests_total", "counter", "Количество HTTP-запросов")
+    for (method, route, status_code), count in request_total.items():
+        lines.append(f"http_requests_total{{{_labels(method=method, route=route, status=status_code)}}} {count}")
+
+    _section(lines, "http_request_db_queries", "histogram", "Запросов к БД за один HTTP-запрос")
+    for (method, route), histogram in request_queries.items():
+        lines += histogram.render("http_request_db_queries", _labels(method=method, route=route))
+
+    _section(lines, "http_request_db_seconds_total", "counter", "Время в БД при обработке HTTP-запросов")
+    for (method, route), seconds in request_db_seconds.items():
+        lines.append(f"http_request_db_seconds_total{{{_labels(method=method, route=route)}}} {seconds}")
+
+    _section(lines, "db_queries_total", "counter", "Запросов к БД (включая фоновые задания)")
+    for name, count in db_queries_total.items():
+        lines.append(f"db_queries_total{{{_labels(engine=name)}}} {count}")
+    _section(lines, "db_query_seconds_total", "counter", "Время выполнения запросов к БД")
+    for name, seconds in db_seconds_total.items():
+        lines.append(f"db_query_seconds_total{{{_labels(engine=name)}}} {seconds}")
+
+    # Пул: счетчики PoolStats считаются при выдаче соединений, здесь только читаются
+    engines = {"primary": engine, "replica": read_engine}
+    pool_metrics = (
+        ("db_pool_checkouts_total", "counter", "Выдано соединений из пула",
+         lambda name, stats: stats.checkouts),
+        ("db_pool_wait_seconds_total", "counter", "Суммарное ожидание соединения из пула",
+         lambda name, stats: stats.wait_total_ms / 1000),
+        ("db_pool_wait_max_seconds", "gauge", "Максимальное ожидание соединения из пула",
+         lambda name, stats: stats.wait_max_ms / 1000),
+        ("db_pool_timeouts_total", "counter", "Таймауты ожидания соединения из пула",
+         lambda name, stats: stats.timeouts),
+        ("db_pool_checked_out", "gauge", "Занятых соединений пула",
+         lambda name, stats: engines[name].sync_engine.pool.checkedout()),
+    )
+    for metric, kind, help_text, value in pool_metrics:
+        _section(lines, metric, kind, help_text)
+        for name, stats in pool_stats.items():
+            lines.append(f"{metric}{{{_labels(engine=name)}}} {value(name, stats)}")
+
+    _section(lines, "scheduler_job_duration_seconds", "histogram", "Длительность заданий планировщика")
+    for job, histogram in job_duration.items():
+        lines += histogram.render("scheduler_job_duration_seconds", _labels(job=job))
+    _section(lines, "scheduler_job_rows_total", "counter", "Строк обновлено заданиями планировщика")
+    for job, rows in job_rows_total.items():
+        lines.append(f"scheduler_job_rows_total{{{_labels(job=job)}}} {rows}")
+    _section(lines, "scheduler_job_failures_total", "counter", "Завершившихся ошибкой запусков заданий")
+    for job, count in job_failures_total.items():
+        lines.append(f"scheduler_job_failures_total{{{_labels(job=job)}}} {count}")
+
+    _section(lines, "app_startup_phase_seconds", "gauge", "Длительность фаз запуска процесса")
+    for phase, seconds in startup_seconds.items():
+        lines.append(f"app_startup_phase_seconds{{{_labels(phase=phase)}}} {seconds}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,58 @@
+import argparse
+import asyncio
+import os
+import sys
+
+# Миграции схемы БД отдельно от запуска приложения:
+#   python migrate.py            - применить недостающие шаги
+#   python migrate.py --status   - показать примененные и ожидающие шаги
+# Строка подключения берется из DATABASE_URL (или --database-url).
+
+
+async def show_status() -> None:
+    from database import engine
+    from migrations import MIGRATIONS, LATEST_VERSION, applied_versions
+
+    async with engine.connect() as conn:
+        applied = await applied_versions(conn)
+    await engine.dispose()
+
+    for version, description, _ in MIGRATIONS:
+        mark = "применена" if version in applied else "ожидает"
+        print(f" {version:>3}  {mark:<10} {description}")
+    pending = [version for version, _, _ in MIGRATIONS if version not in applied]
+    print(f"\nТекущая версия: {max(applied, default=0)}, последняя: {LATEST_VERSION}, ожидают: {len(pending)}")
+
+
+async def migrate() -> None:
+    from database import engine
+    from migrations import run_migrations, LATEST_VERSION
+
+    async with engine.begin() as conn:
+        new_versions = await run_migrations(conn)
+    await engine.dispose()
+
+    if new_versions:
+        print(f"\nПрименено шагов: {len(new_versions)}, версия схемы: {LATEST_VERSION}")
+    else:
+        print(f"Схема БД актуальна (версия {LATEST_VERSION})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Миграции схемы БД")
+    parser.add_argument("--status", action="store_true", help="Только показать состояние миграций")
+    parser.add_argument("--database-url", help="Строка подключения (по умолчанию DATABASE_URL)")
+    args = parser.parse_args()
+
+    # Строку подключения нужно задать до импорта database
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    try:
+        asyncio.run(show_status() if args.status else migrate())
+    except Exception as e:
+        print(f"\n ОШИБКА МИГРАЦИИ: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import os
+import time
+from typing import Awaitable, Callable, List, Tuple
+from sqlalchemy import select, func, inspect, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncConnection
+from database import Base
+from models import Task, SchedulerLease, SchemaVersion, TaskTombstone, GlobalDataVersion
+from search import get_search_backend
+
+# Шаги изменения схемы БД по порядку. Каждый шаг идемпотентен:
+# его можно безопасно выполнить на БД, где изменения уже есть.
+# Примененные шаги записываются в schema_version, поэтому при запуске достаточно
+# сравнить одну версию с LATEST_VERSION (см. database.init_db и migrate.py).
+
+# Ключ advisory-блокировки Postgres, под которой мигрирует только один процесс
+MIGRATION_LOCK_KEY = int(os.getenv("MIGRATION_LOCK_KEY", "7418529631"))
+
+
+async def _create_tables(conn: AsyncConnection) -> None:
+    await conn.run_sync(Base.metadata.create_all)
+
+
+async def _search_schema(conn: AsyncConnection) -> None:
+    # Индексы и служебные таблицы полнотекстового поиска
+    await get_search_backend(conn.dialect.name).ensure_schema(conn)
+
+
+def _create_task_indexes(sync_conn) -> None:
+    # Индексы по колонкам, которых в таблице еще нет, создаст шаг, добавляющий колонку
+    existing = {column["name"] for column in inspect(sync_conn).get_columns(Task.__tablename__)}
+    for index in Task.__table__.indexes:
+        if all(column.name in existing for column in index.columns):
+            index.create(sync_conn, checkfirst=True)
+
+
+async def _task_indexes(conn: AsyncConnection) -> None:
+    # Составные и частичные индексы задач для БД, созданных до их появления в модели
+    await conn.run_sync(_create_task_indexes)
+
+
+async def _scheduler_lease(conn: AsyncConnection) -> None:
+    # Таблица аренды лидерства планировщика (см. leader.py)
+    await conn.run_sync(lambda sync_conn: SchedulerLease.__table__.create(sync_conn, checkfirst=True))
+
+
+async def _delta_sync(conn: AsyncConnection) -> None:
+    # Время изменения задач и отметки об удалении для GET /tasks/changes (см. delta_sync.py)
+    def upgrade(sync_conn) -> None:
+        existing = {column["name"] for column in inspect(sync_conn).get_columns(Task.__tablename__)}
+        if "updated_at" not in existing:
+            column_type = Task.__table__.c.updated_at.type.compile(dialect=sync_conn.dialect)
+            sync_conn.execute(text(f"ALTER TABLE tasks ADD COLUMN updated_at {column_type}"))
+            # Для старых задач лучшая оценка времени изменения - завершение или создание
+            sync_conn.execute(text("UPDATE tasks SET updated_at = COALESCE(completed_at, created_at)"))
+            if sync_conn.dialect.name == "postgresql":
+                sync_conn.execute(text(
+                    "ALTER TABLE tasks ALTER COLUMN updated_at SET DEFAULT now(), "
+                    "ALTER COLUMN updated_at SET NOT NULL"
+                ))
+        _create_task_indexes(sync_conn)
+        TaskTombstone.__table__.create(sync_conn, checkfirst=True)
+
+    await conn.run_sync(upgrade)
+
+
+async def _global_data_version(conn: AsyncConnection) -> None:
+    # Общая версия данных для ETag администратора (см. data_versions.py)
+    await conn.run_sync(lambda sync_conn: GlobalDataVersion.__table__.create(sync_conn, checkfirst=True))
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[AsyncConnection], Awaitable[None]]]] = [
+    (1, "Базовые таблицы", _create_tables),
+    (2, "Полнотекстовый поиск задач", _search_schema),
+    (3, "Составные и частичные индексы задач", _task_indexes),
+    (4, "Аренда лидерства планировщика", _scheduler_lease),
+    (5, "Дельта-синхронизация задач", _delta_sync),
+    (6, "Общая версия данных", _global_data_version),
+]
+
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+async def read_schema_version(conn: AsyncConnection) -> int:
+    """
+    Текущая версия схемы одним запросом, без обращения к системному каталогу.
+    Если таблицы schema_version нет, запрос завершится ошибкой - вызывающий считает это версией 0.
+    """
+    result = await conn.execute(select(func.max(SchemaVersion.version)))
+    return result.scalar() or 0
+
+
+async def applied_versions(conn: AsyncConnection) -> set:
+    """Номера примененных шагов (пустое множество для БД без schema_version)"""
+    def read(sync_conn) -> set:
+        if not inspect(sync_conn).has_table(SchemaVersion.__tablename__):
+            return set()
+        return set(sync_conn.execute(select(SchemaVersion.version)).scalars())
+
+    return await conn.run_sync(read)
+
+
+async def _lock_migrations(conn: AsyncConnection) -> None:
+    """
+    Блокировка на время транзакции миграций: воркеры, запущенные одновременно, мигрируют
+    по очереди, и каждый следующий видит шаги, уже примененные предыдущим.
+    """
+    if conn.dialect.name == "postgresql":
+        # Снимается сама при commit/rollback
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+    else:
+        # Блокировка записи SQLite; должна быть первой командой транзакции
+        await conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+async def run_migrations(conn: AsyncConnection) -> List[int]:
+    """
+    Применяет недостающие шаги по порядку и возвращает их номера.
+    Вызывается на новом соединении внутри engine.begin().
+    """
+    await _lock_migrations(conn)
+    # Примененные шаги читаются только под блокировкой
+    applied = await applied_versions(conn)
+    await conn.run_sync(lambda sync_conn: SchemaVersion.__table__.create(sync_conn, checkfirst=True))
+
+    dialect = postgresql if conn.dialect.name == "postgresql" else sqlite
+    new_versions = []
+    for version, description, step in MIGRATIONS:
+        if version in applied:
+            continue
+        started = time.perf_counter()
+        await step(conn)
+        await conn.execute(
+            dialect.insert(SchemaVersion)
+            .values(version=version, description=description)
+            .on_conflict_do_nothing()
+        )
+        new_versions.append(version)
+        print(f"Миграция {version}: {description} - применена за {(time.perf_counter() - started) * 1000:.0f} мс")
+    return new_versions
@@ -1,5 +1,9 @@
 from database import Base
 from models.task import Task
 from models.user import User, UserRole
+from models.data_version import UserDataVersion, GlobalDataVersion
+from models.scheduler_lease import SchedulerLease
+from models.schema_version import SchemaVersion
+from models.task_tombstone import TaskTombstone
 
-__all__=["Base", "Task", "User", "UserRole"]
\ No newline at end of file
+__all__=["Base", "Task", "User", "UserRole", "UserDataVersion", "GlobalDataVersion", "SchedulerLease", "SchemaVersion", "TaskTombstone"]
\ No newline at end of file
@@ -0,0 +1,47 @@
+from sqlalchemy import Column, Integer, BigInteger, ForeignKey
+from database import Base
+
+class UserDataVersion(Base):
+    """
+    Монотонный счетчик версии задач пользователя.
+    Увеличивается в той же транзакции, что и любое изменение его задач;
+    из него строятся ETag для условных GET-запросов.
+    """
+    __tablename__ = "user_data_versions"
+
+    user_id = Column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+
+    version = Column(
+        BigInteger,
+        nullable=False,
+        default=0
+    )
+
+    def __repr__(self) -> str:
+        return f"<UserDataVersion(user_id={self.user_id}, version={self.version})>"
+
+
+class GlobalDataVersion(Base):
+    """
+    Общий монотонный счетчик изменений задач всех пользователей (одна строка).
+    Увеличивается вместе со счетчиками пользователей; из него строится ETag администратора.
+    """
+    __tablename__ = "global_data_version"
+
+    id = Column(
+        Integer,
+        primary_key=True # всегда 1
+    )
+
+    version = Column(
+        BigInteger,
+        nullable=False,
+        default=0
+    )
+
+    def __repr__(self) -> str:
+        return f"<GlobalDataVersion(version={self.version})>"
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, String
+from database import Base, UTCDateTime
+
+class SchedulerLease(Base):
+    """
+    Аренда лидерства планировщика: задания выполняет только процесс-держатель.
+    Держатель продлевает expires_at; если он перестал это делать, аренду забирает другой процесс.
+    """
+    __tablename__ = "scheduler_leases"
+
+    name = Column(
+        String(50),
+        primary_key=True
+    )
+
+    holder = Column(
+        String(255),
+        nullable=True # NULL - аренда свободна
+    )
+
+    acquired_at = Column(
+        UTCDateTime,
+        nullable=True
+    )
+
+    expires_at = Column(
+        UTCDateTime,
+        nullable=True
+    )
+
+    def __repr__(self) -> str:
+        return f"<SchedulerLease(name={self.name}, holder={self.holder}, expires_at={self.expires_at})>"
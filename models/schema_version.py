@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, func
+from database import Base, UTCDateTime
+
+class SchemaVersion(Base):
+    """
+    Примененные шаги миграций (см. migrations.py), по строке на шаг.
+    Текущая версия схемы - максимальный version; при запуске сравнивается с последним шагом.
+    """
+    __tablename__ = "schema_version"
+
+    version = Column(
+        Integer,
+        primary_key=True
+    )
+
+    description = Column(
+        String(255),
+        nullable=False
+    )
+
+    applied_at = Column(
+        UTCDateTime,
+        server_default=func.now(),
+        nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<SchemaVersion(version={self.version}, description={self.description})>"
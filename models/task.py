@@ -1,10 +1,72 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, func
-from sqlalchemy.dialects.postgresql import TIMESTAMP
+from sqlalchemy import Column, Integer, String, Boolean, Text, ForeignKey, Index, func, case, and_, or_, literal, text
 from sqlalchemy.orm import relationship
-from database import Base
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from database import Base, UTCDateTime
+
+# Задача срочная, если до дедлайна осталось не больше стольких полных дней
+URGENCY_THRESHOLD_DAYS = 3
+
+
+def urgency_cutoff(now: datetime) -> datetime:
+    """
+    Граница срочности: задача срочная, если ее дедлайн раньше этого момента.
+    (deadline - now).days <= 3 равносильно deadline < now + 4 дня.
+    """
+    return now + timedelta(days=URGENCY_THRESHOLD_DAYS + 1)
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def is_urgent(deadline_at: Optional[datetime]) -> bool:
+    """Срочность задачи с таким дедлайном на текущий момент"""
+    if not deadline_at:
+        return False
+    days_until_deadline = (deadline_at - datetime.now(deadline_at.tzinfo)).days
+    return days_until_deadline <= URGENCY_THRESHOLD_DAYS
+
+
+def compute_quadrant(is_important: bool, deadline_at: Optional[datetime]) -> str:
+    """Определяет квадрант матрицы Эйзенхауэра на основе важности и срочности"""
+    urgent = is_urgent(deadline_at)
+    if is_important and urgent:
+        return "Q1"
+    elif is_important and not urgent:
+        return "Q2"
+    elif not is_important and urgent:
+        return "Q3"
+    else:
+        return "Q4"
+
 
 class Task(Base):
     __tablename__ = "tasks"
+    # Индексы под фильтры роутеров и планировщика.
+    # В существующих БД создаются шагом миграции (см. migrations.py)
+    __table_args__ = (
+        Index("ix_tasks_user_quadrant", "user_id", "quadrant"),
+        Index("ix_tasks_user_completed", "user_id", "completed"),
+        Index("ix_tasks_user_deadline", "user_id", "deadline_at"),
+        # Keyset-пагинация GET /tasks: пользователь и администратор
+        Index("ix_tasks_user_created", "user_id", "created_at", "id"),
+        Index("ix_tasks_created", "created_at", "id"),
+        # Дельта-синхронизация GET /tasks/changes: изменения после курсора (updated_at, id)
+        Index("ix_tasks_user_updated", "user_id", "updated_at", "id"),
+        Index("ix_tasks_updated", "updated_at", "id"),
+        # Частичные индексы по незавершенным задачам: пересчет срочности и таймеры
+        Index(
+            "ix_tasks_pending_deadline", "deadline_at",
+            postgresql_where=text("completed = false"),
+            sqlite_where=text("completed = 0")
+        ),
+        Index(
+            "ix_tasks_pending_quadrant", "quadrant", "deadline_at",
+            postgresql_where=text("completed = false"),
+            sqlite_where=text("completed = 0")
+        ),
+    )
     id = Column(
         Integer,
         primary_key=True, # Первичный ключ
@@ -29,7 +91,7 @@ class Task(Base):
     )
 
     deadline_at = Column(
-        TIMESTAMP(timezone=True),
+        UTCDateTime,
         nullable=True
     )
 
@@ -45,16 +107,26 @@ class Task(Base):
     )
  
     created_at = Column(
-        DateTime(timezone=True), # С поддержкой часовых поясов
+        UTCDateTime, # С поддержкой часовых поясов
         server_default=func.now(), # Автоматически текущее время
         nullable=False
     )
 
     completed_at = Column(
-        DateTime(timezone=True),
+        UTCDateTime,
         nullable=True # NULL пока задача не завершена
     )
 
+    # Время последнего изменения: ставится приложением при любом INSERT/UPDATE,
+    # в том числе массовом (onupdate срабатывает и для update(Task))
+    updated_at = Column(
+        UTCDateTime,
+        default=utc_now,
+        onupdate=utc_now,
+        server_default=func.now(),
+        nullable=False
+    )
+
     user_id = Column(
         Integer,
         ForeignKey("users.id", ondelete="CASCADE"), 
@@ -81,23 +153,64 @@ class Task(Base):
             "completed": self.completed,
             "created_at": self.created_at,
             "completed_at": self.completed_at,
+            "updated_at": self.updated_at,
             "user_id": self.user_id
         }
 
+    @classmethod
+    def is_urgent_expression(cls, now: datetime):
+        """SQL-условие срочности задачи относительно момента now"""
+        return and_(cls.deadline_at.isnot(None), cls.deadline_at < urgency_cutoff(now))
+
+    @classmethod
+    def quadrant_expression(
+        cls,
+        now: datetime,
+        is_important: Optional[bool] = None,
+        deadline_at: Optional[datetime] = None,
+        urgent=None
+    ):
+        """
+        SQL-аналог calculate_quadrant для массовых UPDATE ... SET quadrant = CASE ...
+        Переданные is_important/deadline_at подставляются вместо текущих значений колонок
+        (нужно, когда эти поля меняются тем же UPDATE). Для executemany вместо значений
+        передаются параметры: is_important и urgent (срочность нового дедлайна) - bindparam.
+        """
+        if urgent is None:
+            if deadline_at is None:
+                urgent = cls.is_urgent_expression(now)
+            else:
+                urgent = literal(is_urgent(deadline_at))
+        if is_important is None:
+            important = cls.is_important == True
+        elif isinstance(is_important, bool):
+            important = literal(is_important)
+        else:
+            important = is_important
+
+        return case(
+            (and_(important, urgent), "Q1"),
+            (important, "Q2"),
+            (urgent, "Q3"),
+            else_="Q4"
+        )
+
+    @classmethod
+    def stale_urgency_expression(cls, now: datetime):
+        """
+        SQL-условие: незавершенная задача, срочность в квадранте которой не совпадает
+        с ее дедлайном. Условие completed повторено в каждой ветке OR: так каждая ветка -
+        диапазон по частичному индексу ix_tasks_pending_quadrant (quadrant, deadline_at),
+        а не обход всех незавершенных задач.
+        """
+        cutoff = urgency_cutoff(now)
+        pending = cls.completed == False
+        return or_(
+            and_(pending, cls.quadrant.in_(("Q2", "Q4")), cls.deadline_at < cutoff),
+            and_(pending, cls.quadrant.in_(("Q1", "Q3")), cls.deadline_at >= cutoff),
+            and_(pending, cls.quadrant.in_(("Q1", "Q3")), cls.deadline_at.is_(None))
+        )
+
     def calculate_quadrant(self) -> str:
         """Определяет квадрант матрицы Эйзенхауэра на основе важности и срочности"""
-        from datetime import datetime, timedelta
-        
-        is_urgent = False
-        if self.deadline_at:
-            days_until_deadline = (self.deadline_at - datetime.now(self.deadline_at.tzinfo)).days
-            is_urgent = days_until_deadline <= 3
-            
-        if self.is_important and is_urgent:
-            return "Q1"
-        elif self.is_important and not is_urgent:
-            return "Q2"
-        elif not self.is_important and is_urgent:
-            return "Q3"
-        else:
-            return "Q4"
\ No newline at end of file
+        return compute_quadrant(self.is_important, self.deadline_at)
@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Integer, Index
+from database import Base, UTCDateTime
+
+class TaskTombstone(Base):
+    """
+    Отметка об удалении задачи для дельта-синхронизации (GET /tasks/changes):
+    строки задачи уже нет, но клиент должен узнать, что ее нужно удалить у себя.
+    Хранится TOMBSTONE_RETENTION_DAYS дней (см. delta_sync.py).
+    """
+    __tablename__ = "task_tombstones"
+    __table_args__ = (
+        Index("ix_task_tombstones_user_deleted", "user_id", "deleted_at", "task_id"),
+        Index("ix_task_tombstones_deleted", "deleted_at", "task_id"),
+    )
+
+    task_id = Column(
+        Integer,
+        primary_key=True # id удаленной задачи
+    )
+
+    # Без внешнего ключа: отметки переживают удаление задачи
+    user_id = Column(
+        Integer,
+        nullable=False
+    )
+
+    deleted_at = Column(
+        UTCDateTime,
+        nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<TaskTombstone(task_id={self.task_id}, user_id={self.user_id}, deleted_at={self.deleted_at})>"
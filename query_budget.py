@@ -0,0 +1,81 @@
+import os
+from typing import Dict, Tuple
+from metrics import current_request, route_template
+
+# Бюджет запросов к БД на один HTTP-запрос для каждого маршрута.
+# Считается худший успешный случай: пользователь не найден в кеше (+1 запрос в get_current_user),
+# кеш результатов /stats пуст. Бюджет проверяет test_query_budgets.py, а в отладочном
+# режиме (QUERY_DEBUG) превышение печатается в лог прямо во время работы.
+QUERY_BUDGETS: Dict[Tuple[str, str], int] = {
+    # Задачи: пользователь + версия данных для ETag + сам запрос
+    ("GET", "/api/v3/tasks"): 3,
+    ("GET", "/api/v3/tasks/quadrant/{quadrant}"): 3,
+    ("GET", "/api/v3/tasks/search"): 2,
+    ("GET", "/api/v3/tasks/status/{status}"): 3,
+    ("GET", "/api/v3/tasks/today"): 3,
+    ("GET", "/api/v3/tasks/export"): 2,
+    ("GET", "/api/v3/tasks/changes"): 3,          # + изменения задач и отметки об удалении
+    ("GET", "/api/v3/tasks/events"): 1,           # только пользователь, дальше поток без БД
+    ("GET", "/api/v3/tasks/{task_id}"): 2,
+    # Запись: пользователь + INSERT/UPDATE/DELETE ... RETURNING + версии данных (пользователей и общая)
+    ("POST", "/api/v3/tasks"): 5,                  # + refresh после commit
+    ("POST", "/api/v3/tasks/batch"): 10,           # по запросу на группу операций (update - на набор полей + SELECT) + отметки об удалении
+    ("POST", "/api/v3/tasks/import"): 4,           # на одну пачку (id для таймеров срочности - из RETURNING)
+    ("PUT", "/api/v3/tasks/{task_id}"): 4,
+    ("PATCH", "/api/v3/tasks/{task_id}/complete"): 4,
+    ("DELETE", "/api/v3/tasks/{task_id}"): 5,      # + отметка об удалении для /tasks/changes
+    # Статистика: пользователь + версия данных + агрегат (+ группировка)
+    ("GET", "/api/v3/stats/"): 4,
+    ("GET", "/api/v3/stats/deadlines"): 3,
+    # Аутентификация
+    ("POST", "/api/v3/auth/register"): 4,          # проверки email и никнейма + INSERT + refresh
+    ("POST", "/api/v3/auth/login"): 1,
+    ("PATCH", "/api/v3/auth/change-password"): 3,
+    # Администрирование
+    ("GET", "/api/v3/admin/users"): 2,
+    ("GET", "/api/v3/admin/cache/users"): 1,
+    ("GET", "/api/v3/admin/password-hashing"): 1,
+    ("GET", "/api/v3/admin/cache/results"): 1,
+    ("GET", "/api/v3/admin/db/pool"): 1,
+    ("GET", "/api/v3/admin/scheduler"): 2,        # + текущий держатель лидерства
+}
+
+# Отладочный режим: запоминать тексты запросов и предупреждать о повторах и превышении бюджета
+QUERY_DEBUG = os.getenv("QUERY_DEBUG", "false").strip().lower() in ("1", "true", "yes", "on")
+# Сколько раз один и тот же запрос может выполниться за HTTP-запрос до предупреждения (признак N+1)
+REPEATED_QUERY_THRESHOLD = int(os.getenv("REPEATED_QUERY_THRESHOLD", "3"))
+
+
+class QueryDebugMiddleware:
+    """
+    Отладочная ASGI-middleware: предупреждает, если за один HTTP-запрос один и тот же SQL
+    выполнился REPEATED_QUERY_THRESHOLD раз и больше или маршрут превысил бюджет запросов.
+    Подключается внутри MetricsMiddleware и использует ее счетчики текущего запроса.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        stats = current_request.get() if scope["type"] == "http" else None
+        if stats is None:
+            await self.app(scope, receive, send)
+            return
+
+        stats.statements = {}
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = route_template(scope)
+            for statement, count in stats.statements.items():
+                if count >= REPEATED_QUERY_THRESHOLD:
+                    print(
+                        f"[QUERY_DEBUG] {scope['method']} {route}: запрос выполнен {count} раз - "
+                        f"возможен N+1: {' '.join(statement.split())[:200]}"
+                    )
+            budget = QUERY_BUDGETS.get((scope["method"], route))
+            if budget is not None and stats.queries > budget:
+                print(
+                    f"[QUERY_DEBUG] {scope['method']} {route}: {stats.queries} запросов к БД "
+                    f"при бюджете {budget}"
+                )
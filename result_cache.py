@@ -0,0 +1,126 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set
+
+RESULT_CACHE_MAX_SIZE = int(os.getenv("RESULT_CACHE_MAX_SIZE", "5000"))
+
+
+class CacheBackend:
+    """
+    Хранилище кеша результатов. Интерфейс намеренно минимален, чтобы его можно было
+    реализовать поверх Redis: значения с TTL + теги для точечной инвалидации
+    (в Redis - множество ключей на тег).
+    """
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = ()) -> None:
+        raise NotImplementedError
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Удаляет все ключи с любым из тегов, возвращает число удаленных ключей"""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class InMemoryLRUBackend(CacheBackend):
+    """LRU-кеш в памяти процесса (по умолчанию)"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple[Optional[float], Any, tuple]]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value, _ = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            self._delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl=None, tags=()):
+        tags = tuple(tags)
+        if key in self._entries:
+            self._delete(key)
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._entries[key] = (expires_at, value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_size:
+            self._delete(next(iter(self._entries)))
+
+    def invalidate_tags(self, tags):
+        removed = 0
+        for tag in tags:
+            for key in self._tags.pop(tag, set()):
+                if key in self._entries:
+                    self._delete(key)
+                    removed += 1
+        return removed
+
+    def _delete(self, key: str) -> None:
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ResultCache:
+    """Именованный кеш результатов поверх подключаемого хранилища со счетчиками попаданий"""
+
+    def __init__(self, name: str, backend: CacheBackend):
+        self.name = name
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.backend.get(f"{self.name}:{key}")
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = ()) -> None:
+        self.backend.set(f"{self.name}:{key}", value, ttl, [f"{self.name}:{tag}" for tag in tags])
+
+    def invalidate_tags(self, tags: Iterable[str]) -> None:
+        self.invalidations += self.backend.invalidate_tags([f"{self.name}:{tag}" for tag in tags])
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / requests, 4) if requests else None,
+            "invalidated_entries": self.invalidations
+        }
+
+
+def scope_tag(user) -> str:
+    """Тег области данных: администратор видит задачи всех пользователей"""
+    return "all" if user.role.value == "admin" else f"user:{user.id}"
+
+
+def owner_tags(owner_ids: Iterable[int]) -> Set[str]:
+    """Теги, которые затрагивает изменение задач этих владельцев"""
+    return {"all"} | {f"user:{user_id}" for user_id in owner_ids}
+
+
+result_cache_backend: CacheBackend = InMemoryLRUBackend(RESULT_CACHE_MAX_SIZE)
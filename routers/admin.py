@@ -3,9 +3,15 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from typing import List, Dict, Any
 
-from database import get_async_session
+from database import get_async_session, engine, read_engine, describe_pool
 from models import User, Task, UserRole
-from dependencies import get_current_user
+from dependencies import get_current_user, get_current_admin, get_read_session
+from user_cache import UserPrincipal, user_cache
+from auth_utils import password_hasher
+from routers.stats import stats_cache, deadlines_cache
+from result_cache import result_cache_backend
+from leader import leader_election
+from scheduler import scheduler_jobs
 
 router = APIRouter(
     prefix="/admin",
@@ -14,8 +20,8 @@ router = APIRouter(
 
 @router.get("/users", response_model=List[Dict[str, Any]])
 async def get_all_users(
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_async_session)
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_session)
 ) -> List[Dict[str, Any]]:
     """
     Получение списка всех пользователей с количеством их задач.
@@ -52,3 +58,69 @@ async def get_all_users(
         }
         for user in users
     ]
+
+
+@router.get("/cache/users", response_model=Dict[str, Any])
+async def get_user_cache_stats(
+    current_user: UserPrincipal = Depends(get_current_admin)
+) -> Dict[str, Any]:
+    """
+    Статистика кеша аутентифицированных пользователей (размер, попадания, промахи).
+    Доступно только для администраторов.
+    """
+    return user_cache.stats()
+
+
+@router.get("/password-hashing", response_model=Dict[str, Any])
+async def get_password_hashing_stats(
+    current_user: UserPrincipal = Depends(get_current_admin)
+) -> Dict[str, Any]:
+    """
+    Состояние пула хеширования паролей: загрузка, отказы, задержки (мс).
+    Доступно только для администраторов.
+    """
+    return password_hasher.stats()
+
+
+@router.get("/cache/results", response_model=Dict[str, Any])
+async def get_result_cache_stats(
+    current_user: UserPrincipal = Depends(get_current_admin)
+) -> Dict[str, Any]:
+    """
+    Статистика кешей результатов /stats и /stats/deadlines (попадания, промахи, сбросы).
+    Доступно только для администраторов.
+    """
+    return {
+        "size": len(result_cache_backend),
+        "stats": stats_cache.stats(),
+        "deadlines": deadlines_cache.stats()
+    }
+
+
+@router.get("/db/pool", response_model=Dict[str, Any])
+async def get_db_pool_stats(
+    current_user: UserPrincipal = Depends(get_current_admin)
+) -> Dict[str, Any]:
+    """
+    Состояние пула соединений с БД: занятые соединения, переполнение, ожидание (мс).
+    Доступно только для администраторов.
+    """
+    pools = {"primary": describe_pool(engine, "primary")}
+    if read_engine is not None:
+        pools["replica"] = describe_pool(read_engine, "replica")
+    return pools
+
+
+@router.get("/scheduler", response_model=Dict[str, Any])
+async def get_scheduler_status(
+    current_user: UserPrincipal = Depends(get_current_admin)
+) -> Dict[str, Any]:
+    """
+    Состояние планировщика: какой процесс лидер, когда продлевал лидерство,
+    задания этого процесса и время их следующего запуска.
+    Доступно только для администраторов.
+    """
+    return {
+        **await leader_election.status(),
+        "jobs": scheduler_jobs()
+    }
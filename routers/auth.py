@@ -5,8 +5,9 @@ from sqlalchemy import select
 from database import get_async_session
 from models import User, UserRole
 from schemas_auth import UserCreate, UserResponse, Token
-from auth_utils import verify_password, get_password_hash, create_access_token
+from auth_utils import verify_password_async, get_password_hash_async, create_access_token
 from dependencies import get_current_user
+from user_cache import UserPrincipal, user_cache
 from typing import Dict, Any
 from pydantic import BaseModel
 
@@ -49,7 +50,7 @@ async def register(
     new_user = User(
         nickname=user_data.nickname,
         email=user_data.email,
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=await get_password_hash_async(user_data.password),
         role=UserRole.USER # По умолчанию обычный пользователь
     )
 
@@ -72,7 +73,7 @@ async def login(
     user = result.scalar_one_or_none()
 
     # Проверяем пользователя и пароль
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверный email или пароль",
@@ -90,27 +91,32 @@ async def login(
 @router.patch("/change-password", status_code=status.HTTP_200_OK)
 async def change_password(
     passwords: ChangePasswordRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: AsyncSession = Depends(get_async_session)
 ) -> Dict[str, str]:
     """
     Изменение пароля пользователя.
     Требует аутентификации и проверки старого пароля.
     """
+    # В кеше пользователей хеш пароля не хранится, поэтому загружаем строку пользователя
+    result = await db.execute(
+        select(User).where(User.id == current_user.id)
+    )
+    user = result.scalar_one()
+
     # Проверяем старый пароль
-    if not verify_password(passwords.old_password, current_user.hashed_password):
+    if not await verify_password_async(passwords.old_password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Неверный текущий пароль"
         )
     
     # Хешируем новый пароль
-    hashed_password = get_password_hash(passwords.new_password)
+    hashed_password = await get_password_hash_async(passwords.new_password)
     
     # Обновляем пароль в базе данных
-    current_user.hashed_password = hashed_password
+    user.hashed_password = hashed_password
     await db.commit()
-    await db.refresh(current_user)
+    user_cache.invalidate(user.id)
     
     return {"message": "Пароль успешно изменен"}
-
@@ -1,50 +1,157 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_, or_
 from models import Task, User
 from database import get_async_session
 from datetime import datetime, timezone, timedelta
-from typing import List, Dict, Any
-from dependencies import get_current_user
+from typing import List, Dict, Any, Optional
+from dependencies import get_current_user, get_read_session
+from data_versions import task_data_etag
+from result_cache import ResultCache, result_cache_backend, scope_tag, owner_tags
+from task_events import on_tasks_committed
+import os
+from user_cache import UserPrincipal
 router = APIRouter(
     prefix="/stats",
     tags=["statistics"]
 )
 
+# Кеши результатов. Ключ - ETag запроса: он уже включает область данных, версию данных
+# и параметры запроса, поэтому запись в другом процессе тоже делает старые записи недостижимыми.
+# Локальные записи дополнительно сбрасываются сразу после commit изменения задач.
+stats_cache = ResultCache("stats", result_cache_backend)
+deadlines_cache = ResultCache("deadlines", result_cache_backend)
+
+# days_remaining зависит от текущего времени, поэтому список дедлайнов живет в кеше недолго
+DEADLINES_CACHE_TTL_SECONDS = float(os.getenv("DEADLINES_CACHE_TTL_SECONDS", "60"))
+
+
+@on_tasks_committed
+def _invalidate_stats_caches(owner_ids) -> None:
+    tags = owner_tags(owner_ids)
+    stats_cache.invalidate_tags(tags)
+    deadlines_cache.invalidate_tags(tags)
+
+QUADRANTS = ("Q1", "Q2", "Q3", "Q4")
+
+# Допустимые измерения дополнительной группировки статистики
+STATS_GROUPINGS = ("user", "created_day", "completed_day")
+
+
+async def _grouped_stats(
+    db: AsyncSession,
+    conditions: list,
+    group_by: str
+) -> List[Dict[str, Any]]:
+    """Считает счетчики задач в разрезе выбранного измерения одним GROUP BY запросом"""
+    conditions = list(conditions)
+    if group_by == "user":
+        dimension = Task.user_id
+    elif group_by == "created_day":
+        dimension = func.date(Task.created_at)
+    else:
+        dimension = func.date(Task.completed_at)
+        conditions.append(Task.completed_at.isnot(None))
+
+    result = await db.execute(
+        select(
+            dimension.label("key"),
+            func.count().label("total"),
+            func.count().filter(Task.completed == True).label("completed"),
+            *[func.count().filter(Task.quadrant == q).label(q) for q in QUADRANTS]
+        ).where(*conditions).group_by(dimension).order_by(dimension)
+    )
+
+    return [
+        {
+            "key": row.key,
+            "total": row.total,
+            "completed": row.completed,
+            "pending": row.total - row.completed,
+            "by_quadrant": {q: row._mapping[q] for q in QUADRANTS}
+        }
+        for row in result.all()
+    ]
+
+
+def _stats_grouping(
+    group_by: Optional[str] = Query(
+        None,
+        description="Дополнительная группировка: user (только для администраторов), created_day, completed_day",
+        json_schema_extra={"enum": list(STATS_GROUPINGS)}
+    ),
+    current_user: UserPrincipal = Depends(get_current_user)
+) -> Optional[str]:
+    """
+    Проверяет группировку до вычисления ETag: зависимости выполняются раньше проверки
+    параметров обработчика, и неверный group_by с совпавшим If-None-Match получил бы 304
+    """
+    if group_by is not None and group_by not in STATS_GROUPINGS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Неверная группировка. Используйте: user, created_day, completed_day"
+        )
+    if group_by == "user" and current_user.role.value != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Группировка по пользователям доступна только администраторам"
+        )
+    return group_by
+
+
 @router.get("/", response_model=dict)
 async def get_tasks_stats(
-    db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    group_by: Optional[str] = Depends(_stats_grouping),
+    db: AsyncSession = Depends(get_read_session),
+    current_user: UserPrincipal = Depends(get_current_user),
+    etag: str = Depends(task_data_etag)
 ) -> dict:
-    # Для администраторов получаем все задачи, для обычных пользователей - только их задачи
-    if current_user.role.value == "admin":
-        result = await db.execute(select(Task))
-    else:
-        result = await db.execute(select(Task).where(Task.user_id == current_user.id))
-        
-    tasks = result.scalars().all()
-    total_tasks = len(tasks)
-    by_quadrant = {"Q1": 0, "Q2": 0, "Q3": 0, "Q4": 0}
+    response.headers["ETag"] = etag
+    is_admin = current_user.role.value == "admin"
+
+    cached = stats_cache.get(etag)
+    if cached is not None:
+        return cached
+
+    # Для администраторов считаем все задачи, для обычных пользователей - только их задачи
+    conditions = [] if is_admin else [Task.user_id == current_user.id]
+
+    # Считаем счетчики на стороне БД, не загружая сами задачи
+    result = await db.execute(
+        select(Task.quadrant, Task.completed, func.count().label("count"))
+        .where(*conditions)
+        .group_by(Task.quadrant, Task.completed)
+    )
+
+    total_tasks = 0
+    by_quadrant = {q: 0 for q in QUADRANTS}
     by_status = {"completed": 0, "pending": 0}
-    
-    for task in tasks:
-        if task.quadrant in by_quadrant:
-            by_quadrant[task.quadrant] += 1
-        if task.completed:
-            by_status["completed"] += 1
-        else:
-            by_status["pending"] += 1
-
-    return {
+
+    for quadrant, completed, count in result.all():
+        total_tasks += count
+        if quadrant in by_quadrant:
+            by_quadrant[quadrant] += count
+        by_status["completed" if completed else "pending"] += count
+
+    stats = {
         "total_tasks": total_tasks,
         "by_quadrant": by_quadrant,
         "by_status": by_status
     }
+    if group_by is not None:
+        stats["group_by"] = group_by
+        stats["groups"] = await _grouped_stats(db, conditions, group_by)
+
+    stats_cache.set(etag, stats, tags=[scope_tag(current_user)])
+    return stats
 
 @router.get("/deadlines", response_model=List[Dict[str, Any]])
 async def get_pending_tasks_deadlines(
-    db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    db: AsyncSession = Depends(get_read_session),
+    current_user: UserPrincipal = Depends(get_current_user),
+    etag: str = Depends(task_data_etag)
 ) -> List[Dict[str, Any]]:
     """
     Возвращает список невыполненных задач с информацией о дедлайнах.
@@ -57,6 +164,12 @@ async def get_pending_tasks_deadlines(
     - days_remaining: количество дней до дедлайна (None если дедлайн не установлен)
     - is_overdue: просрочена ли задача
     """
+    response.headers["ETag"] = etag
+
+    cached = deadlines_cache.get(etag)
+    if cached is not None:
+        return cached
+
     # Базовое условие для невыполненных задач с дедлайном
     conditions = [
         Task.completed == False,
@@ -96,5 +209,11 @@ async def get_pending_tasks_deadlines(
             "quadrant": task.quadrant,
             "is_important": task.is_important
         })
-    
+
+    deadlines_cache.set(
+        etag,
+        tasks_with_deadlines,
+        ttl=DEADLINES_CACHE_TTL_SECONDS,
+        tags=[scope_tag(current_user)]
+    )
     return tasks_with_deadlines
@@ -1,13 +1,34 @@
-from fastapi import APIRouter, HTTPException, Query, status, Depends
-from typing import List, Optional
+import asyncio
+from fastapi import APIRouter, HTTPException, Query, Request, status, Depends
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, List, Optional, Tuple
 from datetime import datetime, timezone, date, timedelta
-from schemas import TaskCreate, TaskUpdate, TaskResponse
+from schemas import (
+    TaskCreate, TaskUpdate, TaskResponse, TaskPage, TaskSearchPage,
+    TaskBatchRequest, TaskBatchResult, TaskBatchResponse, TaskImportResult, TaskChangesPage
+)
+from pydantic import ValidationError
 from database import init_db, get_async_session
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, tuple_
 from models import Task
-from dependencies import get_current_user
+from dependencies import get_current_user, get_read_session
+from user_cache import UserPrincipal
 from models import User, UserRole
+from pagination import encode_cursor, decode_cursor
+from scheduler import urgency_timers
+from search import get_search_backend
+from serializers import (
+    FastJSONResponse, dumps,
+    TASK_EXPORT_COLUMNS, TASK_SELECTABLE_FIELDS, ndjson_chunk, csv_chunk,
+    parse_fields, fieldset_columns, project_rows
+)
+from data_versions import task_data_etag
+from task_events import tasks_changed, task_event
+import crud
+import task_import
+import change_feed
+import delta_sync
 
 
 router = APIRouter(
@@ -25,41 +46,167 @@ async def get_all_tasks(
     # FastAPI автоматически преобразует Task → TaskResponse
     return tasks"""
 
-@router.get("", response_model=List[TaskResponse])
+# Размер пачки строк, которую серверный курсор отдает за один раз в режиме стриминга
+STREAM_BATCH_SIZE = 500
+
+
+def _task_response(task: Task) -> TaskResponse:
+    days_until_deadline = None
+    if task.deadline_at:
+        delta = task.deadline_at - datetime.now(task.deadline_at.tzinfo)
+        days_until_deadline = delta.days
+
+    task_data = task.to_dict()
+    task_data['days_until_deadline'] = days_until_deadline
+    return TaskResponse(**task_data)
+
+
+def _track_urgency(task: Task) -> None:
+    """Ставит или снимает таймер перехода задачи в срочные"""
+    if task.completed:
+        urgency_timers.cancel(task.id)
+    else:
+        urgency_timers.schedule(task.id, task.deadline_at)
+
+
+def _task_fieldset(
+    fields: Optional[str] = Query(
+        None,
+        description=f"Поля ответа через запятую (по умолчанию все): {', '.join(TASK_SELECTABLE_FIELDS)}"
+    )
+) -> Optional[Tuple[str, ...]]:
+    """Разреженный набор полей списка задач (fields=id,title,deadline_at)"""
+    try:
+        return parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Неизвестные поля: {e}. Доступны: {', '.join(TASK_SELECTABLE_FIELDS)}"
+        )
+
+
+async def _list_tasks(
+    db: AsyncSession,
+    user: UserPrincipal,
+    fields: Optional[Tuple[str, ...]],
+    etag: str,
+    *conditions
+) -> FastJSONResponse:
+    """Выбирает только колонки запрошенных полей и отдает список через быстрый сериализатор"""
+    result = await db.execute(
+        crud.task_list_query(user, *conditions, columns=fieldset_columns(fields))
+    )
+    return FastJSONResponse(project_rows(result.all(), fields), headers={"ETag": etag})
+
+
+async def _stream_tasks_json(db: AsyncSession, query, fields: Optional[Tuple[str, ...]]) -> AsyncIterator[bytes]:
+    """Читает задачи серверным курсором и отдает JSON-массив по частям"""
+    now = datetime.now(timezone.utc)
+    result = await db.stream(
+        query.execution_options(yield_per=STREAM_BATCH_SIZE)
+    )
+    yield b"["
+    first = True
+    async for partition in result.partitions():
+        chunk = b",".join(dumps(task) for task in project_rows(partition, fields, now))
+        if not first:
+            chunk = b"," + chunk
+        first = False
+        yield chunk
+    yield b"]"
+
+
+# Форматы выгрузки задач и их content-type
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+async def _stream_export(request: Request, db: AsyncSession, query, export_format: str) -> AsyncIterator[bytes]:
+    """
+    Читает задачи серверным курсором пачками по STREAM_BATCH_SIZE строк и кодирует каждую пачку.
+    Если клиент отключился, чтение прекращается и курсор закрывается.
+    """
+    result = await db.stream(
+        query.execution_options(yield_per=STREAM_BATCH_SIZE)
+    )
+    try:
+        if export_format == "csv":
+            yield csv_chunk([], header=True)
+        async for partition in result.partitions():
+            if await request.is_disconnected():
+                print(" Выгрузка задач прервана: клиент отключился")
+                break
+            if export_format == "csv":
+                yield csv_chunk(partition)
+            else:
+                yield ndjson_chunk(partition)
+    finally:
+        await result.close()
+
+
+@router.get("", response_model=TaskPage)
 async def get_all_tasks(
+    limit: int = Query(50, ge=1, le=500, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="Курсор из next_cursor предыдущей страницы"),
+    stream: bool = Query(False, description="Отдать все задачи потоком, без пагинации"),
+    fields: Optional[Tuple[str, ...]] = Depends(_task_fieldset),
     # Сессия базы данных (автоматически через Depends
-    db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user) 
-) -> List[TaskResponse]:
-    if current_user.role.value == "admin":
-        result = await db.execute(select(Task))
-    else:
-        result = await db.execute(
-            select(Task).where(Task.user_id == current_user.id)
+    db: AsyncSession = Depends(get_read_session),
+    current_user: UserPrincipal = Depends(get_current_user),
+    # ETag по версии данных пользователя; при совпадении с If-None-Match сразу отвечаем 304
+    etag: str = Depends(task_data_etag)
+):
+    conditions = []
+    # Keyset-пагинация по (created_at, id): продолжаем строго после последней отданной задачи
+    if cursor is not None:
+        try:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Некорректный курсор")
+        conditions.append(
+            tuple_(Task.created_at, Task.id) > tuple_(cursor_created_at, cursor_id)
         )
 
-    tasks = result.scalars().all()
-
-    tasks_with_days = []
-    for task in tasks:
-        days_until_deadline = None
-        if task.deadline_at:
-            delta = task.deadline_at - datetime.now(task.deadline_at.tzinfo)
-            days_until_deadline = delta.days
-            
-        task_data = task.to_dict()
-        task_data['days_until_deadline'] = days_until_deadline
-        tasks_with_days.append(TaskResponse(**task_data))
-    
-    return tasks_with_days
+    # Колонки курсора выбираются всегда, даже если их нет в fields
+    query = crud.task_list_query(
+        current_user, *conditions, columns=fieldset_columns(fields, Task.created_at, Task.id)
+    ).order_by(Task.created_at, Task.id)
+
+    if stream:
+        return StreamingResponse(
+            _stream_tasks_json(db, query, fields),
+            media_type="application/json",
+            headers={"ETag": etag}
+        )
+
+    # Берем на одну запись больше, чтобы понять, есть ли следующая страница
+    result = await db.execute(query.limit(limit + 1))
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    return FastJSONResponse(
+        {
+            "items": project_rows(rows, fields),
+            "next_cursor": next_cursor
+        },
+        headers={"ETag": etag}
+    )
 
 
 @router.get("/quadrant/{quadrant}",
             response_model=List[TaskResponse])
 async def get_tasks_by_quadrant(
     quadrant: str,
-    db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends (get_current_user)
+    fields: Optional[Tuple[str, ...]] = Depends(_task_fieldset),
+    db: AsyncSession = Depends(get_read_session),
+    current_user: UserPrincipal = Depends(get_current_user),
+    etag: str = Depends(task_data_etag)
 ) -> List[TaskResponse]:
     if quadrant not in ["Q1", "Q2", "Q3", "Q4"]:
         raise HTTPException(
@@ -67,104 +214,190 @@ async def get_tasks_by_quadrant(
             detail="Неверный квадрант. Используйте: Q1, Q2, Q3, Q4" # текст, который будет выведен пользователю
         )
 
-    if current_user.role.value == "admin":
-        result = await db.execute(
-            select (Task).where(Task.quadrant == quadrant)
-        )
-    else:
-        result = await db.execute(
-            select(Task).where(
-                Task.quadrant == quadrant,
-                Task.user_id == current_user.id
-            )
-        )
-
-    tasks = result.scalars().all()
-    return tasks
+    return await _list_tasks(db, current_user, fields, etag, Task.quadrant == quadrant)
 
-@router.get("/search", response_model=List[TaskResponse])
+@router.get("/search", response_model=TaskSearchPage)
 async def search_tasks(
     q: str = Query(..., min_length=2),
-    db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user) 
-) -> List[TaskResponse]:
-    keyword = f"%{q.lower()}%" # %keyword% для LIKE
-    if current_user.role.value == "admin":
-        result = await db.execute(
-        select (Task).where(
-            (Task.title.ilike(keyword)) |
-            (Task.description.ilike(keyword))
-        )
-    )
-    else:
-        result = await db.execute(
-            select (Task).where(
-                Task.user_id == current_user.id,
-                (Task.title.ilike(keyword)) |
-                (Task.description.ilike (keyword))
-        )
-    )        
-    tasks = result.scalars().all()
-    if not tasks:
-        raise HTTPException(status_code=404, detail="По данному запросу ничего не найдено")
-    return tasks
+    limit: int = Query(20, ge=1, le=100, description="Размер страницы"),
+    offset: int = Query(0, ge=0, description="Смещение от начала выдачи"),
+    fields: Optional[Tuple[str, ...]] = Depends(_task_fieldset),
+    db: AsyncSession = Depends(get_read_session),
+    current_user: UserPrincipal = Depends(get_current_user) 
+) -> TaskSearchPage:
+    # Поиск идет по индексу (tsvector/pg_trgm в Postgres, FTS5 в SQLite), выдача отсортирована по релевантности
+    backend = get_search_backend(db.bind.dialect.name)
+    user_id = None if current_user.role.value == "admin" else current_user.id
+
+    # Берем на одну запись больше, чтобы понять, есть ли следующая страница
+    rows = await backend.search(db, q, user_id, limit + 1, offset, columns=fieldset_columns(fields))
+
+    next_offset = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_offset = offset + limit
+
+    # Пустая выдача - это пустая страница, а не ошибка
+    return FastJSONResponse({
+        "items": project_rows(rows, fields),
+        "next_offset": next_offset
+    })
 
 @router.get("/status/{status}", response_model=List[TaskResponse])
 async def get_tasks_by_status (
     status: str,
-    db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends (get_current_user)
+    fields: Optional[Tuple[str, ...]] = Depends(_task_fieldset),
+    db: AsyncSession = Depends(get_read_session),
+    current_user: UserPrincipal = Depends(get_current_user),
+    etag: str = Depends(task_data_etag)
 ) -> List[TaskResponse]:
     if status not in ["completed", "pending"]:
         raise HTTPException(status_code=404, detail="Недопустимый статус. Используйте: completed или pending")
     is_completed = (status == "completed")
-    if current_user.role.value == "admin":
-        result = await db.execute(
-            select(Task).where(Task.completed == is_completed)
-        )
-    else:
-        result = await db. execute(
-            select(Task).where(
-                Task. completed == is_completed, 
-                Task.user_id == current_user.id
-        )
-    )    
-    tasks = result.scalars().all()
-    return tasks
+    return await _list_tasks(db, current_user, fields, etag, Task.completed == is_completed)
 
 @router.get("/today", response_model=List[TaskResponse])
 async def get_tasks_due_today(
-    db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user)
+    fields: Optional[Tuple[str, ...]] = Depends(_task_fieldset),
+    db: AsyncSession = Depends(get_read_session),
+    current_user: UserPrincipal = Depends(get_current_user),
+    etag: str = Depends(task_data_etag)
 ) -> List[TaskResponse]:
     today = date.today()
     start_of_day = datetime.combine(today, datetime.min.time()).astimezone()
     end_of_day = datetime.combine(today, datetime.max.time()).astimezone()
     
-    if current_user.role.value == "admin":
-        result = await db.execute(
-            select(Task).where(
-                Task.deadline_at >= start_of_day,
-                Task.deadline_at <= end_of_day
-            )
-        )
-    else:
-        result = await db.execute(
-            select(Task).where(
-                Task.user_id == current_user.id,
-                Task.deadline_at >= start_of_day,
-                Task.deadline_at <= end_of_day
-            )
+    return await _list_tasks(
+        db, current_user, fields, etag,
+        Task.deadline_at >= start_of_day,
+        Task.deadline_at <= end_of_day
+    )
+
+@router.get("/export")
+async def export_tasks(
+    request: Request,
+    format: str = Query("ndjson", description="Формат выгрузки: ndjson или csv"),
+    quadrant: Optional[str] = Query(None, description="Квадрант: Q1, Q2, Q3, Q4"),
+    status: Optional[str] = Query(None, description="Статус: completed или pending"),
+    deadline_from: Optional[datetime] = Query(None, description="Дедлайн не раньше"),
+    deadline_to: Optional[datetime] = Query(None, description="Дедлайн не позже"),
+    user_id: Optional[int] = Query(None, description="Задачи пользователя (только для администратора)"),
+    db: AsyncSession = Depends(get_read_session),
+    current_user: UserPrincipal = Depends(get_current_user)
+) -> StreamingResponse:
+    # Полная выгрузка задач потоком: память не зависит от количества задач
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Неверный формат. Используйте: ndjson или csv")
+
+    conditions = []
+    if quadrant is not None:
+        if quadrant not in ["Q1", "Q2", "Q3", "Q4"]:
+            raise HTTPException(status_code=400, detail="Неверный квадрант. Используйте: Q1, Q2, Q3, Q4")
+        conditions.append(Task.quadrant == quadrant)
+    if status is not None:
+        if status not in ["completed", "pending"]:
+            raise HTTPException(status_code=400, detail="Недопустимый статус. Используйте: completed или pending")
+        conditions.append(Task.completed == (status == "completed"))
+    if deadline_from is not None:
+        conditions.append(Task.deadline_at >= deadline_from)
+    if deadline_to is not None:
+        conditions.append(Task.deadline_at <= deadline_to)
+    if user_id is not None:
+        if current_user.role.value != "admin":
+            raise HTTPException(status_code=403, detail="Фильтр по пользователю доступен только администратору")
+        conditions.append(Task.user_id == user_id)
+
+    query = (
+        select(*TASK_EXPORT_COLUMNS)
+        .where(*crud.ownership_conditions(current_user), *conditions)
+        .order_by(Task.created_at, Task.id)
+    )
+    return StreamingResponse(
+        _stream_export(request, db, query, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="tasks.{format}"'}
+    )
+
+
+async def _stream_task_events(
+    request: Request,
+    subscription: change_feed.Subscription,
+    duration: Optional[float]
+) -> AsyncIterator[bytes]:
+    """
+    Отдает события подписки в формате SSE. Пока событий нет, раз в
+    CHANGE_FEED_KEEPALIVE_SECONDS отправляется комментарий, чтобы прокси не закрыли соединение.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + duration if duration is not None else None
+    try:
+        yield b"retry: 3000\n\n"
+        while deadline is None or loop.time() < deadline:
+            timeout = change_feed.CHANGE_FEED_KEEPALIVE_SECONDS
+            if deadline is not None:
+                timeout = min(timeout, deadline - loop.time())
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=max(timeout, 0))
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield b": keepalive\n\n"
+                continue
+            yield change_feed.format_sse(event)
+    finally:
+        change_feed.broker.unsubscribe(subscription)
+
+
+@router.get("/events")
+async def task_events_stream(
+    request: Request,
+    duration: Optional[float] = Query(None, ge=0, description="Закрыть поток через указанное число секунд"),
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserPrincipal = Depends(get_current_user)
+) -> StreamingResponse:
+    # Лента изменений задач (Server-Sent Events): created, updated, completed, deleted,
+    # imported, quadrant_changed. Событие resync - события потеряны, нужно перечитать задачи
+    # Соединение с БД нужно только для аутентификации: возвращаем его в пул до начала потока
+    await db.close()
+    subscription = change_feed.broker.subscribe(current_user)
+    return StreamingResponse(
+        _stream_task_events(request, subscription, duration),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/changes", response_model=TaskChangesPage)
+async def get_task_changes(
+    since: Optional[str] = Query(None, description="Курсор next_cursor прошлой синхронизации (без него - полная)"),
+    limit: int = Query(500, ge=1, le=1000, description="Максимум изменений в ответе"),
+    fields: Optional[Tuple[str, ...]] = Depends(_task_fieldset),
+    db: AsyncSession = Depends(get_read_session),
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    # Дельта-синхронизация: только задачи, измененные после курсора, и id удаленных.
+    # При has_more клиент сразу запрашивает следующую страницу, иначе сохраняет next_cursor
+    # до следующей синхронизации (и по событию resync из /tasks/events)
+    since_key = None
+    if since is not None:
+        try:
+            since_key = decode_cursor(since)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Некорректный курсор")
+
+    try:
+        page = await delta_sync.load_changes(db, current_user, since_key, limit, fields)
+    except delta_sync.CursorExpired:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Курсор устарел: выполните полную синхронизацию (запрос без since)"
         )
-        
-    tasks = result.scalars().all()
-    return tasks
+    return FastJSONResponse(page)
 
 @router.get("/{task_id}", response_model=TaskResponse)
 async def get_task_by_id(
     task_id: int,
     db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ) -> TaskResponse:
     result = await db.execute(
         select(Task).where(Task.id == task_id)
@@ -199,7 +432,7 @@ async def get_task_by_id(
 async def create_task(
     task: TaskCreate,
     db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ) -> TaskResponse:
     # Создаем экземпляр Task из данных запроса
     db_task = Task(
@@ -217,80 +450,192 @@ async def create_task(
     
     # Добавляем задачу в сессию
     db.add(db_task)
+    await db.flush()  # INSERT сейчас, чтобы событие ленты изменений получило id задачи
+    await tasks_changed(  # Версия данных для ETag, сброс кешей и событие ленты изменений
+        db, [current_user.id], [task_event("created", db_task.id, current_user.id, db_task.quadrant)]
+    )
     await db.commit()  # Сохраняем изменения в БД
     await db.refresh(db_task)  # Обновляем объект данными из БД
+    _track_urgency(db_task)
     
     return db_task
 
+def _batch_error(index: int, op: str, task_id: int, reason: Exception) -> TaskBatchResult:
+    if isinstance(reason, crud.TaskAccessDenied):
+        return TaskBatchResult(index=index, op=op, status=403, id=task_id, error="Нет доступа к этой задаче")
+    return TaskBatchResult(index=index, op=op, status=404, id=task_id, error="Задача не найдена")
+
+
+@router.post("/batch", response_model=TaskBatchResponse)
+async def batch_tasks(
+    batch: TaskBatchRequest,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserPrincipal = Depends(get_current_user)
+) -> TaskBatchResponse:
+    """
+    Пакетное создание, обновление, завершение и удаление задач в одной транзакции.
+    Операции выполняются группами (create, update, complete, delete), каждая группа -
+    минимальным числом запросов. Поэтому одна задача может встречаться в пакете только
+    в одной операции: иначе порядок групп разошелся бы с порядком в запросе, и такой
+    пакет целиком отклоняется с кодом 422. Ошибки отдельных элементов возвращаются
+    в results и не отменяют остальные операции.
+    """
+    seen, repeated = set(), set()
+    for operation in batch.operations:
+        if operation.id is not None:
+            (repeated if operation.id in seen else seen).add(operation.id)
+    if repeated:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Задача может встречаться в пакете только в одной операции: "
+                   + ", ".join(str(task_id) for task_id in sorted(repeated))
+        )
+
+    results: List[Optional[TaskBatchResult]] = [None] * len(batch.operations)
+    creates, updates, completes, deletes = [], [], [], []
+
+    # Проверяем данные каждой операции отдельно
+    for index, operation in enumerate(batch.operations):
+        if operation.op != "create" and operation.id is None:
+            results[index] = TaskBatchResult(
+                index=index, op=operation.op, status=422, error="Не указан id задачи"
+            )
+            continue
+        try:
+            if operation.op == "create":
+                creates.append((index, TaskCreate.model_validate(operation.data or {})))
+            elif operation.op == "update":
+                updates.append((index, operation.id, TaskUpdate.model_validate(operation.data or {})))
+            elif operation.op == "complete":
+                completes.append((index, operation.id))
+            else:
+                deletes.append((index, operation.id))
+        except ValidationError as e:
+            results[index] = TaskBatchResult(
+                index=index, op=operation.op, status=422, id=operation.id,
+                error=e.errors(include_url=False, include_context=False, include_input=False)
+            )
+
+    created = await crud.create_tasks(db, current_user, [task for _, task in creates])
+    updated = await crud.update_tasks(db, current_user, [(task_id, changes) for _, task_id, changes in updates])
+    completed = await crud.complete_tasks(db, current_user, [task_id for _, task_id in completes])
+    deleted = await crud.delete_tasks(db, current_user, [task_id for _, task_id in deletes])
+
+    # Одним запросом выясняем, каких задач нет, а какие чужие
+    missing = [task_id for (_, task_id, _), task in zip(updates, updated) if task is None]
+    missing += [task_id for _, task_id in completes if task_id not in completed]
+    missing += [task_id for _, task_id in deletes if task_id not in deleted]
+    reasons = await crud.classify_missing(db, missing)
+
+    owner_ids = {task.user_id for task in created}
+    owner_ids |= {task.user_id for task in updated if task is not None}
+    owner_ids |= {task.user_id for task in completed.values()}
+    owner_ids |= {row["user_id"] for row in deleted.values()}
+    events = [task_event("created", task.id, task.user_id, task.quadrant) for task in created]
+    events += [task_event("updated", task.id, task.user_id, task.quadrant) for task in updated if task is not None]
+    events += [task_event("completed", task.id, task.user_id, task.quadrant) for task in completed.values()]
+    events += [task_event("deleted", row["id"], row["user_id"]) for row in deleted.values()]
+    await tasks_changed(db, owner_ids, events)
+
+    await db.commit()
+
+    for (index, _), task in zip(creates, created):
+        _track_urgency(task)
+        results[index] = TaskBatchResult(
+            index=index, op="create", status=201, id=task.id, task=_task_response(task)
+        )
+    for (index, task_id, _), task in zip(updates, updated):
+        if task is None:
+            results[index] = _batch_error(index, "update", task_id, reasons[task_id])
+            continue
+        _track_urgency(task)
+        results[index] = TaskBatchResult(
+            index=index, op="update", status=200, id=task_id, task=_task_response(task)
+        )
+    for index, task_id in completes:
+        if task_id not in completed:
+            results[index] = _batch_error(index, "complete", task_id, reasons[task_id])
+            continue
+        urgency_timers.cancel(task_id)
+        results[index] = TaskBatchResult(
+            index=index, op="complete", status=200, id=task_id, task=_task_response(completed[task_id])
+        )
+    for index, task_id in deletes:
+        if task_id not in deleted:
+            results[index] = _batch_error(index, "delete", task_id, reasons[task_id])
+            continue
+        urgency_timers.cancel(task_id)
+        results[index] = TaskBatchResult(index=index, op="delete", status=200, id=task_id)
+
+    return TaskBatchResponse(results=results)
+
+def _track_imported_urgency(tasks: List[Tuple[int, datetime]]) -> None:
+    """Ставит таймеры срочности задачам загруженной пачки импорта"""
+    for task_id, deadline_at in tasks:
+        urgency_timers.schedule(task_id, deadline_at)
+
+
+@router.post("/import", response_model=TaskImportResult)
+async def import_tasks(
+    request: Request,
+    format: str = Query("ndjson", description="Формат тела запроса: ndjson или csv"),
+    db: AsyncSession = Depends(get_async_session),
+    current_user: UserPrincipal = Depends(get_current_user)
+) -> TaskImportResult:
+    """
+    Массовый импорт задач из потока NDJSON или CSV.
+    Тело читается по частям, строки проверяются схемой TaskCreate и загружаются пачками
+    (COPY в Postgres, многострочный INSERT в остальных СУБД). Ошибочные строки
+    возвращаются в errors и не отменяют загрузку остальных.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Неверный формат. Используйте: ndjson или csv")
+
+    reader = task_import.read_csv if format == "csv" else task_import.read_ndjson
+    return await task_import.import_tasks(
+        db, current_user, reader(request.stream()), on_loaded=_track_imported_urgency
+    )
+
 @router.put("/{task_id}", response_model=TaskResponse)
 async def update_task(
     task_id: int,
     task_update: TaskUpdate,
     db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ) -> TaskResponse:
-    # Получаем задачу по ID
-    result = await db.execute(select(Task).where(Task.id == task_id))
-    db_task = result.scalar_one_or_none()
-    
-    if db_task is None:
+    # Обновляем задачу одним запросом: права доступа проверяются в WHERE,
+    # квадрант пересчитывается, если изменились важность или дедлайн
+    try:
+        db_task = await crud.update_task(db, task_id, current_user, task_update)
+    except crud.TaskNotFound:
         raise HTTPException(status_code=404, detail="Задача не найдена")
-    
-    # Проверяем права доступа
-    if current_user.role.value != "admin" and db_task.user_id != current_user.id:
+    except crud.TaskAccessDenied:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Нет прав для обновления этой задачи"
         )
-    
-    # Флаг для отслеживания изменения полей, влияющих на квадрант
-    quadrant_needs_update = False
-    
-    # Обновляем поля, если они были переданы
-    if task_update.title is not None:
-        db_task.title = task_update.title
-    if task_update.description is not None:
-        db_task.description = task_update.description
-    if task_update.is_important is not None:
-        db_task.is_important = task_update.is_important
-        quadrant_needs_update = True
-    if task_update.deadline_at is not None:
-        db_task.deadline_at = task_update.deadline_at
-        quadrant_needs_update = True
-    if task_update.completed is not None:
-        db_task.completed = task_update.completed
-        if task_update.completed:
-            db_task.completed_at = datetime.now(timezone.utc)
-        else:
-            db_task.completed_at = None
+
+    _track_urgency(db_task)
+    return _task_response(db_task)
 
     
 @router.patch("/{task_id}/complete", response_model=TaskResponse)
 async def complete_task(
     task_id: int,
     db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ) -> TaskResponse:
-    # Получаем задачу по ID
-    result = await db.execute(select(Task).where(Task.id == task_id))
-    task = result.scalar_one_or_none()
-    if not task:
+    # Помечаем задачу как выполненную одним запросом UPDATE ... RETURNING
+    try:
+        task = await crud.complete_task(db, task_id, current_user)
+    except crud.TaskNotFound:
         raise HTTPException(status_code=404, detail="Задача не найдена")
-    
-    # Проверяем права доступа
-    if current_user.role.value != "admin" and task.user_id != current_user.id:
+    except crud.TaskAccessDenied:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Нет доступа к этой задаче"
         )
-    
-    # Помечаем задачу как выполненную
-    task.completed = True
-    task.completed_at = datetime.now(timezone.utc)
-    
-    # Сохраняем изменения в базе данных
-    await db.commit()
-    await db.refresh(task)
+    urgency_timers.cancel(task.id)
     
     # Добавляем days_until_deadline и status_message в ответ
     task_data = task.to_dict()
@@ -311,31 +656,22 @@ async def complete_task(
 async def delete_task(
     task_id: int,
     db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user)
+    current_user: UserPrincipal = Depends(get_current_user)
 ) -> dict:
-    result = await db.execute(
-        select(Task).where(Task.id == task_id)
-    )
-    task = result.scalar_one_or_none()
-    if not task:
+    # Удаляем задачу одним запросом DELETE ... RETURNING
+    try:
+        deleted_task = await crud.delete_task(db, task_id, current_user)
+    except crud.TaskNotFound:
         raise HTTPException(status_code=404, detail="Задача не найдена")
-    
-    # Проверяем права доступа
-    if current_user.role.value != "admin" and task.user_id != current_user.id:
+    except crud.TaskAccessDenied:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Нет прав для удаления этой задачи"
         )
+    urgency_timers.cancel(task_id)
     
-    # Сохраняем информацию для ответа
-    deleted_task_info = {
-        "id": task.id,
-        "title": task.title,
+    return {
+        "id": deleted_task["id"],
+        "title": deleted_task["title"],
         "message": "Задача успешно удалена"
     }
-    
-    # Удаляем задачу из базы данных
-    await db.delete(task)
-    await db.commit()
-    
-    return deleted_task_info
\ No newline at end of file
@@ -1,73 +1,255 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from sqlalchemy import select, and_
-from sqlalchemy.ext.asyncio import AsyncSession
-from database import get_async_session
-from models.task import Task
-from datetime import datetime, timezone
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from sqlalchemy import select, update
+from database import AsyncSessionLocal
+from models.task import Task, urgency_cutoff
+from urgency_timers import UrgencyTimerQueue
+from task_events import tasks_changed, task_event
+from metrics import record_job
+from delta_sync import purge_tombstones
+from leader import leader_election, LEADER_HEARTBEAT_SECONDS
+from datetime import datetime, timedelta, timezone
+import os
+import time
 
 
 # Глобальная переменная для хранения экземпляра планировщика
 scheduler = AsyncIOScheduler()
 
-async def update_task_urgency():
+# Таймеры перехода задач в срочные (обновляются роутерами при записи задач)
+urgency_timers = UrgencyTimerQueue()
+
+# Сколько задач обновляется и фиксируется одной транзакцией
+URGENCY_CHUNK_SIZE = int(os.getenv("URGENCY_CHUNK_SIZE", "1000"))
+# Через сколько секунд лидер повторяет неудавшуюся загрузку таймеров срочности
+URGENCY_SEED_RETRY_SECONDS = float(os.getenv("URGENCY_SEED_RETRY_SECONDS", "30"))
+
+def _quadrant_events(rows) -> list:
+    """События ленты изменений для задач, у которых планировщик пересчитал квадрант"""
+    return [task_event("quadrant_changed", row.id, row.user_id, row.quadrant) for row in rows]
+
+async def update_task_urgency() -> dict:
     """
-    Асинхронная функция для обновления срочности (квадранта) всех незавершенных задач.
-    Пересчитывает квадрант на основе текущей даты и дедлайна задачи.
+    Асинхронная функция для обновления срочности (квадранта) незавершенных задач.
+    Квадрант пересчитывается на стороне БД (UPDATE ... SET quadrant = CASE ...)
+    только для задач, чей дедлайн пересек порог срочности.
+    Обновление идет пачками по URGENCY_CHUNK_SIZE задач, каждая пачка - отдельная транзакция.
     """
     print("Запуск автоматического обновления срочности задач.")
-    
-    # Получаем сессию БД
-    db = await get_async_session().__anext__()
-    
+    started = time.perf_counter()
+
+    # Один момент времени на весь прогон, чтобы пачки не расходились в оценке срочности
+    now = datetime.now(timezone.utc)
+    new_quadrant = Task.quadrant_expression(now)
+    stale_condition = Task.stale_urgency_expression(now)
+
+    updated_count = 0
+    chunks = 0
+
+    async with AsyncSessionLocal() as db:
+        try:
+            while True:
+                # Берем очередную пачку задач, у которых срочность разошлась с дедлайном
+                result = await db.execute(
+                    select(Task.id).where(stale_condition).limit(URGENCY_CHUNK_SIZE)
+                )
+                task_ids = result.scalars().all()
+                if not task_ids:
+                    break
+
+                result = await db.execute(
+                    update(Task)
+                    .where(Task.id.in_(task_ids), stale_condition)
+                    .values(quadrant=new_quadrant)
+                    .returning(Task.id, Task.user_id, Task.quadrant)
+                    .execution_options(synchronize_session=False)
+                )
+                rows = result.all()
+                await tasks_changed(db, [row.user_id for row in rows], _quadrant_events(rows))
+                await db.commit()
+
+                updated_count += len(rows)
+                chunks += 1
+        except Exception as e:
+            await db.rollback()
+            print(f"Ошибка при обновлении: {str(e)}")
+            record_job("update_task_urgency", time.perf_counter() - started, updated_count, failed=True)
+            raise
+
+    duration_ms = (time.perf_counter() - started) * 1000
+    record_job("update_task_urgency", duration_ms / 1000, updated_count)
+    if updated_count > 0:
+        print(f"Обновлено {updated_count} задач ({chunks} пачек) за {duration_ms:.1f} мс.")
+    else:
+        print(f"Обновлений по задачам нет ({duration_ms:.1f} мс)")
+
+    return {
+        "updated": updated_count,
+        "chunks": chunks,
+        "duration_ms": round(duration_ms, 1)
+    }
+
+def _rearm_urgency_timer() -> None:
+    """Переставляет одноразовое задание планировщика на ближайший таймер срочности"""
+    if not scheduler.running:
+        return
+
+    next_due = urgency_timers.next_due()
+    if next_due is None:
+        if scheduler.get_job('urgency_timer'):
+            scheduler.remove_job('urgency_timer')
+        return
+
+    scheduler.add_job(
+        fire_urgency_timers,
+        trigger=DateTrigger(run_date=next_due),
+        id='urgency_timer',
+        name='Переход задач в срочные по таймеру',
+        replace_existing=True
+    )
+
+urgency_timers.on_change = _rearm_urgency_timer
+
+async def fire_urgency_timers() -> int:
+    """Переводит в срочные ровно те задачи, чьи таймеры сработали"""
+    now = datetime.now(timezone.utc)
+    task_ids = urgency_timers.pop_due(now)
+    updated_count = 0
+    started = time.perf_counter()
+    failed = True
+
     try:
-        # Получаем все незавершенные задачи
-        result = await db.execute(
-            select(Task).where(Task.completed == False)
+        if task_ids:
+            async with AsyncSessionLocal() as db:
+                for i in range(0, len(task_ids), URGENCY_CHUNK_SIZE):
+                    result = await db.execute(
+                        update(Task)
+                        .where(
+                            Task.id.in_(task_ids[i:i + URGENCY_CHUNK_SIZE]),
+                            Task.stale_urgency_expression(now)
+                        )
+                        .values(quadrant=Task.quadrant_expression(now))
+                        .returning(Task.id, Task.user_id, Task.quadrant)
+                        .execution_options(synchronize_session=False)
+                    )
+                    rows = result.all()
+                    await tasks_changed(db, [row.user_id for row in rows], _quadrant_events(rows))
+                    await db.commit()
+                    updated_count += len(rows)
+            print(f"По таймерам срочности обновлено {updated_count} задач.")
+        failed = False
+    finally:
+        record_job("fire_urgency_timers", time.perf_counter() - started, updated_count, failed=failed)
+        _rearm_urgency_timer()
+
+    return updated_count
+
+async def seed_urgency_timers() -> int:
+    """
+    Заполняет таймеры при запуске: берет незавершенные задачи,
+    которые станут срочными в будущем (диапазонный запрос по deadline_at).
+    """
+    now = datetime.now(timezone.utc)
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            select(Task.id, Task.deadline_at)
+            .where(
+                Task.completed == False,
+                Task.deadline_at >= urgency_cutoff(now)
+            )
+            .execution_options(yield_per=URGENCY_CHUNK_SIZE)
         )
-        tasks = result.scalars().all()
-        
-        updated_count = 0
-        
-        for task in tasks:
-            # Сохраняем старый квадрант для сравнения
-            old_quadrant = task.quadrant
-            
-            # Вычисляем новый квадрант
-            new_quadrant = task.calculate_quadrant()
-            
-            # Если квадрант изменился, обновляем задачу
-            if old_quadrant != new_quadrant:
-                task.quadrant = new_quadrant
-                updated_count += 1
-        
-        # Сохраняем изменения в БД
-        if updated_count > 0:
-            await db.commit()
-            print(f"Обновлено {updated_count} задач.")
-        else:
-            print("Обновлений по задачам нет")
-            
-    except Exception as e:
-        await db.rollback()
-        print(f"Ошибка при обновлении: {str(e)}")
-        raise
+        async for task_id, deadline_at in result:
+            urgency_timers.schedule(task_id, deadline_at, notify=False)
+
+    _rearm_urgency_timer()
+    print(f"Таймеров срочности загружено: {len(urgency_timers)}")
+    return len(urgency_timers)
+
+async def purge_task_tombstones() -> int:
+    """Удаляет устаревшие отметки об удалении задач (см. delta_sync.py)"""
+    started = time.perf_counter()
+    purged = 0
+    failed = True
+    try:
+        async with AsyncSessionLocal() as db:
+            purged = await purge_tombstones(db)
+        print(f"Удалено устаревших отметок об удалении задач: {purged}")
+        failed = False
     finally:
-        await db.close()
+        record_job("purge_task_tombstones", time.perf_counter() - started, purged, failed=failed)
+    return purged
+
+def _schedule_urgency_seed(delay: float = 0) -> None:
+    scheduler.add_job(
+        _seed_urgency_timers_job,
+        trigger=DateTrigger(run_date=datetime.now(timezone.utc) + timedelta(seconds=delay)),
+        id='urgency_timers_seed',
+        name='Загрузка таймеров срочности',
+        replace_existing=True
+    )
+
+async def _seed_urgency_timers_job() -> None:
+    """
+    Загрузка таймеров лидером - отдельное задание, а не часть продления лидерства:
+    долгая загрузка не задерживает heartbeat, а ошибка повторяется через URGENCY_SEED_RETRY_SECONDS.
+    """
+    if not leader_election.is_leader:
+        return
+    try:
+        await seed_urgency_timers()
+    except Exception as e:
+        print(f"Ошибка загрузки таймеров срочности: {e}, повтор через {URGENCY_SEED_RETRY_SECONDS:.0f} с")
+        _schedule_urgency_seed(URGENCY_SEED_RETRY_SECONDS)
+
+async def _on_leader_elected() -> None:
+    """
+    Процесс стал лидером: берет на себя ежедневную сверку срочности и очистку
+    отметок об удалении, загружает таймеры срочности всех задач из БД (в фоне).
+    """
+    scheduler.add_job(
+        update_task_urgency,
+        trigger=CronTrigger(hour=9, minute=0),
+        id='daily_urgency_update',
+        name='Обновление срочности задач',
+        replace_existing=True
+    )
+    scheduler.add_job(
+        purge_task_tombstones,
+        trigger=CronTrigger(hour=3, minute=0),
+        id='daily_tombstone_purge',
+        name='Очистка отметок об удалении задач',
+        replace_existing=True
+    )
+    _schedule_urgency_seed()
+
+async def _on_leader_demoted() -> None:
+    # Таймеры уже записанных этим процессом задач остаются: повторное срабатывание
+    # на другом процессе безопасно, UPDATE меняет только устаревшие квадранты
+    for job_id in ('daily_urgency_update', 'daily_tombstone_purge', 'urgency_timers_seed'):
+        if scheduler.get_job(job_id):
+            scheduler.remove_job(job_id)
+
+leader_election.on_elected = _on_leader_elected
+leader_election.on_demoted = _on_leader_demoted
 
 def start_scheduler():
     """
-    Запускает планировщик с настройками по умолчанию:
-    - Ежедневно в 9:00 утра
-    - Каждые 5 минут
+    Запускает планировщик в каждом процессе:
+    - Переход задач в срочные по таймерам задач, записанных этим процессом
+    - Периодическая попытка стать лидером (см. leader.py). Только лидер загружает таймеры
+      всех задач и выполняет ежедневно в 9:00 утра сверку срочности как страховку
+      (таймеры живут в памяти процесса и не видят записей других процессов)
+    Первую попытку стать лидером делает lifespan сразу после запуска.
     """
     if not scheduler.running:
-        # Добавляем задачу на ежедневное выполнение в 9:00
         scheduler.add_job(
-            update_task_urgency,
-            trigger=CronTrigger(hour=9, minute=0),
-            id='daily_urgency_update',
-            name='Обновление срочности задач',
+            leader_election.heartbeat,
+            trigger=IntervalTrigger(seconds=LEADER_HEARTBEAT_SECONDS),
+            id='leader_heartbeat',
+            name='Выбор лидера планировщика',
             replace_existing=True
         )
         
@@ -84,6 +266,13 @@ def start_scheduler():
         # Запускаем планировщик
         scheduler.start()
 
+def scheduler_jobs() -> list:
+    """Задания планировщика этого процесса (для /admin/scheduler)"""
+    return [
+        {"id": job.id, "name": job.name, "next_run_time": job.next_run_time}
+        for job in scheduler.get_jobs()
+    ]
+
 
 def stop_scheduler():
     """Останавливает планировщик"""
@@ -1,6 +1,6 @@
 # Pydantic модели
 from pydantic import BaseModel, Field, computed_field
-from typing import Optional, Union
+from typing import Any, Dict, List, Literal, Optional, Union
 from datetime import datetime, timezone
 
 # Базовая схема для Task.
@@ -78,5 +78,88 @@ class TaskResponse(TaskBase):
         delta = self.deadline_at - now
         return max(0, delta.days)
 
+# Страница задач для keyset-пагинации
+class TaskPage(BaseModel):
+    items: List[TaskResponse] = Field(
+        ...,
+        description="Задачи текущей страницы")
+    next_cursor: Optional[str] = Field(
+        None,
+        description="Курсор следующей страницы (None, если это последняя страница)")
+
+# Измененная задача в ответе дельта-синхронизации
+class TaskChange(TaskResponse):
+    updated_at: datetime = Field(
+        ...,
+        description="Дата и время последнего изменения задачи")
+
+# Страница дельта-синхронизации: изменения после курсора since
+class TaskChangesPage(BaseModel):
+    changed: List[TaskChange] = Field(
+        ...,
+        description="Созданные и измененные задачи в порядке изменения")
+    deleted: List[int] = Field(
+        ...,
+        description="ID удаленных задач")
+    next_cursor: str = Field(
+        ...,
+        description="Курсор для следующего запроса (since)")
+    has_more: bool = Field(
+        ...,
+        description="Есть еще изменения - запросить сразу со следующим курсором")
+
+# Страница результатов поиска (результаты отсортированы по релевантности)
+class TaskSearchPage(BaseModel):
+    items: List[TaskResponse] = Field(
+        ...,
+        description="Найденные задачи текущей страницы")
+    next_offset: Optional[int] = Field(
+        None,
+        description="Смещение следующей страницы (None, если это последняя страница)")
+
+# Одна операция пакетного запроса.
+# data проверяется отдельно для каждой операции (TaskCreate/TaskUpdate),
+# чтобы ошибка в одном элементе не отклоняла весь пакет
+class TaskBatchOperation(BaseModel):
+    op: Literal["create", "update", "complete", "delete"] = Field(
+        ...,
+        description="Тип операции")
+    id: Optional[int] = Field(
+        None,
+        description="ID задачи (для update, complete, delete)")
+    data: Optional[Dict[str, Any]] = Field(
+        None,
+        description="Поля задачи (для create и update)")
+
+class TaskBatchRequest(BaseModel):
+    operations: List[TaskBatchOperation] = Field(
+        ...,
+        min_length=1,
+        max_length=1000,
+        description="Операции; выполняются в одной транзакции группами: create, update, complete, delete. "
+                    "Каждый id задачи - не больше чем в одной операции, иначе весь пакет отклоняется (422)")
+
+# Результат одной операции пакета; status - HTTP-код, который вернул бы одиночный запрос
+class TaskBatchResult(BaseModel):
+    index: int
+    op: str
+    status: int
+    id: Optional[int] = None
+    task: Optional[TaskResponse] = None
+    error: Optional[Any] = None
+
+class TaskBatchResponse(BaseModel):
+    results: List[TaskBatchResult]
+
+# Отчет об импорте задач: сколько загружено и какие строки отклонены
+class TaskImportError(BaseModel):
+    line: int = Field(..., description="Номер строки во входных данных")
+    error: Union[str, List[Any]] = Field(..., description="Ошибка разбора или валидации строки")
+
+class TaskImportResult(BaseModel):
+    imported: int = Field(..., description="Загружено задач")
+    failed: int = Field(..., description="Отклонено строк")
+    errors: List[TaskImportError] = Field(..., description="Ошибки по строкам (не больше IMPORT_MAX_ERRORS)")
+
 class Config: # Config класс для работы с ORM (понадобится посде подключения СУБД)
     from_attributes = True
\ No newline at end of file
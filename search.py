@@ -0,0 +1,160 @@
+import os
+import re
+from typing import Dict, List, Optional
+from sqlalchemy import Row, select, or_, func, cast, text, table, column, literal_column
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from models.task import Task
+from serializers import TASK_RESPONSE_COLUMNS
+
+# Конфигурация полнотекстового поиска Postgres ("simple" - без стемминга, подходит для любых языков)
+SEARCH_TS_CONFIG = os.getenv("SEARCH_TS_CONFIG", "simple")
+
+
+class SearchBackend:
+    """Интерфейс индексируемого поиска задач по названию и описанию"""
+
+    async def ensure_schema(self, conn: AsyncConnection) -> None:
+        """Создает служебные колонки, индексы и таблицы поиска (идемпотентно)"""
+        raise NotImplementedError
+
+    async def search(
+        self,
+        db: AsyncSession,
+        q: str,
+        user_id: Optional[int],
+        limit: int,
+        offset: int,
+        columns: tuple = TASK_RESPONSE_COLUMNS
+    ) -> List[Row]:
+        """
+        Возвращает строки с колонками columns (по умолчанию TASK_RESPONSE_COLUMNS),
+        отсортированные по релевантности (user_id=None - по всем пользователям)
+        """
+        raise NotImplementedError
+
+
+class PostgresSearchBackend(SearchBackend):
+    """tsvector-колонка с GIN-индексом + триграммные индексы pg_trgm для поиска по подстроке"""
+
+    async def ensure_schema(self, conn: AsyncConnection) -> None:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await conn.execute(text(
+            "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            "GENERATED ALWAYS AS ("
+            f"setweight(to_tsvector('{SEARCH_TS_CONFIG}', coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{SEARCH_TS_CONFIG}', coalesce(description, '')), 'B')"
+            ") STORED"
+        ))
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_tasks_search_vector ON tasks USING GIN (search_vector)"
+        ))
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_tasks_title_trgm ON tasks USING GIN (title gin_trgm_ops)"
+        ))
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_tasks_description_trgm ON tasks USING GIN (description gin_trgm_ops)"
+        ))
+
+    async def search(self, db, q, user_id, limit, offset, columns=TASK_RESPONSE_COLUMNS):
+        search_vector = literal_column("tasks.search_vector")
+        tsquery = func.websearch_to_tsquery(cast(SEARCH_TS_CONFIG, REGCONFIG), q)
+        keyword = f"%{q}%"
+
+        # Совпадение по словам (GIN по tsvector) или по подстроке (GIN по триграммам)
+        conditions = [or_(
+            search_vector.op("@@")(tsquery),
+            Task.title.ilike(keyword),
+            Task.description.ilike(keyword)
+        )]
+        if user_id is not None:
+            conditions.append(Task.user_id == user_id)
+
+        rank = func.ts_rank(search_vector, tsquery) + func.similarity(Task.title, q)
+        result = await db.execute(
+            select(*columns)
+            .where(*conditions)
+            .order_by(rank.desc(), Task.id)
+            .limit(limit)
+            .offset(offset)
+        )
+        return result.all()
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """FTS5-таблица, синхронизируемая с tasks триггерами (для локального запуска и тестов)"""
+
+    tasks_fts = table("tasks_fts", column("rowid"))
+
+    async def ensure_schema(self, conn: AsyncConnection) -> None:
+        result = await conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_fts'"
+        ))
+        created = result.scalar() is None
+
+        await conn.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5("
+            "title, description, content='tasks', content_rowid='id', tokenize='unicode61')"
+        ))
+        await conn.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN "
+            "INSERT INTO tasks_fts(rowid, title, description) VALUES (new.id, new.title, new.description); "
+            "END"
+        ))
+        await conn.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN "
+            "INSERT INTO tasks_fts(tasks_fts, rowid, title, description) "
+            "VALUES ('delete', old.id, old.title, old.description); "
+            "END"
+        ))
+        await conn.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS tasks_fts_au AFTER UPDATE ON tasks BEGIN "
+            "INSERT INTO tasks_fts(tasks_fts, rowid, title, description) "
+            "VALUES ('delete', old.id, old.title, old.description); "
+            "INSERT INTO tasks_fts(rowid, title, description) VALUES (new.id, new.title, new.description); "
+            "END"
+        ))
+        if created:
+            # Индексируем задачи, которые появились до создания FTS-таблицы
+            await conn.execute(text("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')"))
+
+    @staticmethod
+    def build_match_query(q: str) -> Optional[str]:
+        """Превращает пользовательский запрос в FTS5-запрос: каждое слово ищется как префикс"""
+        terms = re.findall(r"\w+", q)
+        if not terms:
+            return None
+        return " ".join(f'"{term}"*' for term in terms)
+
+    async def search(self, db, q, user_id, limit, offset, columns=TASK_RESPONSE_COLUMNS):
+        match_query = self.build_match_query(q)
+        if match_query is None:
+            return []
+
+        conditions = [text("tasks_fts MATCH :match_query").bindparams(match_query=match_query)]
+        if user_id is not None:
+            conditions.append(Task.user_id == user_id)
+
+        # bm25: чем меньше значение, тем релевантнее
+        result = await db.execute(
+            select(*columns)
+            .join(self.tasks_fts, self.tasks_fts.c.rowid == Task.id)
+            .where(*conditions)
+            .order_by(literal_column("bm25(tasks_fts)"), Task.id)
+            .limit(limit)
+            .offset(offset)
+        )
+        return result.all()
+
+
+_backends: Dict[str, SearchBackend] = {
+    "postgresql": PostgresSearchBackend(),
+    "sqlite": SQLiteSearchBackend(),
+}
+
+
+def get_search_backend(dialect_name: str) -> SearchBackend:
+    try:
+        return _backends[dialect_name]
+    except KeyError:
+        raise RuntimeError(f"Поиск не поддерживается для СУБД {dialect_name}")
@@ -0,0 +1,135 @@
+from datetime import datetime, timezone
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+import csv
+import io
+import orjson
+from fastapi.responses import JSONResponse
+from models import Task
+
+# Быстрый путь сериализации списков задач: из БД выбираются только нужные колонки
+# (кортежи вместо ORM-объектов), производные поля считаются относительно одного now
+# на весь запрос, результат кодируется orjson. Формат ответа совпадает с TaskResponse:
+# те же поля в том же порядке, datetime в ISO 8601 с "Z" для UTC.
+
+# Колонки в порядке полей TaskResponse
+TASK_RESPONSE_COLUMNS = (
+    Task.title,
+    Task.description,
+    Task.is_important,
+    Task.deadline_at,
+    Task.id,
+    Task.quadrant,
+    Task.completed,
+    Task.created_at,
+)
+TASK_RESPONSE_FIELDS = tuple(column.key for column in TASK_RESPONSE_COLUMNS)
+
+
+def days_remaining(deadline_at: Optional[datetime], now: datetime) -> Optional[int]:
+    """То же, что TaskResponse.days_remaining, но с общим для запроса now"""
+    if deadline_at is None:
+        return None
+    if deadline_at.tzinfo is None:
+        deadline_at = deadline_at.replace(tzinfo=timezone.utc)
+    return max(0, (deadline_at - now).days)
+
+
+def task_row_to_dict(row: Sequence[Any], now: datetime) -> dict:
+    """Строка из TASK_RESPONSE_COLUMNS -> словарь в формате TaskResponse"""
+    data = dict(zip(TASK_RESPONSE_FIELDS, row))
+    data["days_remaining"] = days_remaining(data["deadline_at"], now)
+    return data
+
+
+def task_rows_to_dicts(rows: Iterable[Sequence[Any]], now: Optional[datetime] = None) -> List[dict]:
+    now = now or datetime.now(timezone.utc)
+    return [task_row_to_dict(row, now) for row in rows]
+
+
+# Разреженные наборы полей (fields=title,deadline_at): из БД выбираются только колонки
+# запрошенных полей, в ответ попадают только они (в порядке полей TaskResponse)
+TASK_SELECTABLE_FIELDS = TASK_RESPONSE_FIELDS + ("days_remaining",)
+_FIELD_COLUMNS = dict(zip(TASK_RESPONSE_FIELDS, TASK_RESPONSE_COLUMNS))
+
+
+def parse_fields(value: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """'title,id' -> ('id', 'title'); None - все поля. Бросает ValueError для неизвестных полей"""
+    if value is None:
+        return None
+    requested = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = requested - set(TASK_SELECTABLE_FIELDS)
+    if not requested or unknown:
+        raise ValueError(", ".join(sorted(unknown)))
+    return tuple(name for name in TASK_SELECTABLE_FIELDS if name in requested)
+
+
+def fieldset_columns(fields: Optional[Tuple[str, ...]], *extra) -> tuple:
+    """
+    Колонки SELECT для набора полей: days_remaining считается из deadline_at,
+    extra - колонки, нужные самому обработчику (например, для курсора)
+    """
+    if fields is None:
+        columns = list(TASK_RESPONSE_COLUMNS)
+    else:
+        needed = {"deadline_at" if name == "days_remaining" else name for name in fields}
+        columns = [column for name, column in _FIELD_COLUMNS.items() if name in needed]
+    keys = {column.key for column in columns}
+    return tuple(columns + [column for column in extra if column.key not in keys])
+
+
+def project_rows(
+    rows: Iterable[Any],
+    fields: Optional[Tuple[str, ...]],
+    now: Optional[datetime] = None
+) -> List[dict]:
+    """Строки из fieldset_columns -> словари только с запрошенными полями"""
+    now = now or datetime.now(timezone.utc)
+    if fields is None:
+        return task_rows_to_dicts(rows, now)
+    with_days = "days_remaining" in fields
+    columns = [name for name in fields if name != "days_remaining"]
+    result = []
+    for row in rows:
+        values = row._mapping
+        data = {name: values[name] for name in columns}
+        if with_days:
+            data["days_remaining"] = days_remaining(values["deadline_at"], now)
+        result.append(data)
+    return result
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON-ответ, кодируемый orjson (datetime в UTC сериализуются с "Z", как в pydantic)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# Колонки выгрузки задач (NDJSON/CSV): все поля задачи, включая владельца и дату завершения
+TASK_EXPORT_COLUMNS = TASK_RESPONSE_COLUMNS + (Task.completed_at, Task.user_id)
+TASK_EXPORT_FIELDS = tuple(column.key for column in TASK_EXPORT_COLUMNS)
+
+
+def ndjson_chunk(rows: Iterable[Sequence[Any]]) -> bytes:
+    """Пачка строк выгрузки в формате NDJSON (один JSON-объект на строку)"""
+    return b"".join(dumps(dict(zip(TASK_EXPORT_FIELDS, row))) + b"\n" for row in rows)
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return "" if value is None else value
+
+
+def csv_chunk(rows: Iterable[Sequence[Any]], header: bool = False) -> bytes:
+    """Пачка строк выгрузки в формате CSV (с заголовком для первой пачки)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(TASK_EXPORT_FIELDS)
+    writer.writerows([_csv_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
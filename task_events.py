@@ -0,0 +1,90 @@
+from datetime import datetime, timezone
+from typing import Callable, Iterable, List, Optional, Set
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from data_versions import bump_versions
+from database import mark_primary_sticky
+
+# Единая точка уведомления об изменении задач.
+# tasks_changed вызывается в транзакции записи до commit: увеличивает версии данных
+# владельцев и запоминает их в сессии. После успешного commit вызываются
+# подписчики on_tasks_committed (сброс кешей и т.д.), после rollback - ничего.
+# Вместе с владельцами можно передать события по задачам (created, updated, ...) -
+# они уходят подписчикам on_task_events_committed (лента изменений, см. change_feed.py).
+
+_PENDING_KEY = "changed_task_owners"
+_EVENTS_KEY = "pending_task_events"
+
+_listeners: List[Callable[[Set[int]], None]] = []
+_event_listeners: List[Callable[[List[dict]], None]] = []
+
+
+def task_event(
+    event_type: str,
+    task_id: Optional[int],
+    user_id: int,
+    quadrant: Optional[str] = None,
+    **extra
+) -> dict:
+    """Событие ленты изменений: created, updated, completed, deleted, quadrant_changed, imported"""
+    return {
+        "type": event_type,
+        "task_id": task_id,
+        "user_id": user_id,
+        "quadrant": quadrant,
+        "at": datetime.now(timezone.utc).isoformat(),
+        **extra
+    }
+
+
+def on_tasks_committed(listener: Callable[[Set[int]], None]) -> Callable[[Set[int]], None]:
+    """Регистрирует подписчика; он получает множество id владельцев измененных задач"""
+    _listeners.append(listener)
+    return listener
+
+
+def on_task_events_committed(listener: Callable[[List[dict]], None]) -> Callable[[List[dict]], None]:
+    """Регистрирует подписчика на события по задачам зафиксированной транзакции"""
+    _event_listeners.append(listener)
+    return listener
+
+
+async def tasks_changed(db: AsyncSession, owner_ids: Iterable[int], events: Iterable[dict] = ()) -> None:
+    owner_ids = set(owner_ids)
+    if not owner_ids:
+        return
+    await bump_versions(db, owner_ids)
+    db.sync_session.info.setdefault(_PENDING_KEY, set()).update(owner_ids)
+    events = list(events)
+    if events:
+        db.sync_session.info.setdefault(_EVENTS_KEY, []).extend(events)
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_committed(session: Session) -> None:
+    owner_ids = session.info.pop(_PENDING_KEY, None)
+    events = session.info.pop(_EVENTS_KEY, None)
+    if owner_ids:
+        for listener in _listeners:
+            try:
+                listener(owner_ids)
+            except Exception as e:
+                # Ошибка подписчика не должна ломать уже зафиксированную запись
+                print(f"Ошибка обработчика изменения задач: {str(e)}")
+    if events:
+        for event_listener in _event_listeners:
+            try:
+                event_listener(events)
+            except Exception as e:
+                print(f"Ошибка обработчика событий задач: {str(e)}")
+
+
+# Владельцы измененных задач какое-то время читают из основной БД (см. get_read_session)
+on_tasks_committed(mark_primary_sticky)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_EVENTS_KEY, None)
@@ -0,0 +1,230 @@
+import csv
+import os
+from datetime import datetime, timezone
+from typing import AsyncIterable, AsyncIterator, Callable, List, Optional, Tuple
+import orjson
+from pydantic import ValidationError
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Task
+from models.task import compute_quadrant
+from schemas import TaskCreate
+from task_events import tasks_changed, task_event
+from user_cache import UserPrincipal
+
+# Импорт задач из потока NDJSON/CSV: тело запроса читается по частям, строки проверяются
+# схемой TaskCreate и загружаются пачками по IMPORT_BATCH_SIZE (каждая пачка - своя транзакция).
+# Ошибочные строки пропускаются и попадают в отчет, остальные загружаются.
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+# Сколько ошибок возвращать в ответе (счетчик failed учитывает все)
+IMPORT_MAX_ERRORS = 100
+# Максимальная длина строки во входном потоке: более длинная строка не накапливается
+# в памяти, а отбрасывается до перевода строки и попадает в отчет как ошибка
+IMPORT_MAX_LINE_BYTES = int(os.getenv("IMPORT_MAX_LINE_BYTES", str(1024 * 1024)))
+LINE_TOO_LONG = f"Строка длиннее {IMPORT_MAX_LINE_BYTES} байт"
+
+IMPORT_COLUMNS = (
+    "title", "description", "is_important", "deadline_at",
+    "quadrant", "completed", "created_at", "updated_at", "user_id"
+)
+
+# (номер строки, данные задачи, ошибка разбора)
+ImportRecord = Tuple[int, Optional[dict], Optional[str]]
+# Вызывается после фиксации каждой пачки с (id, deadline_at) загруженных задач с дедлайном
+ImportedCallback = Callable[[List[Tuple[int, datetime]]], None]
+
+
+async def _lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Разбивает поток байтов на строки, не собирая тело целиком.
+    Вместо строки длиннее IMPORT_MAX_LINE_BYTES отдается None.
+    """
+    buffer = b""
+    line_no = 0
+    # Текущая строка уже слишком длинная: ее байты отбрасываются до перевода строки
+    skipping = False
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            if skipping or len(line) > IMPORT_MAX_LINE_BYTES:
+                skipping = False
+                yield line_no, None
+            else:
+                yield line_no, line.rstrip(b"\r")
+        if len(buffer) > IMPORT_MAX_LINE_BYTES:
+            skipping = True
+            buffer = b""
+    if skipping:
+        yield line_no + 1, None
+    elif buffer:
+        yield line_no + 1, buffer.rstrip(b"\r")
+
+
+async def read_ndjson(chunks: AsyncIterable[bytes]) -> AsyncIterator[ImportRecord]:
+    """Одна задача - один JSON-объект на строке"""
+    async for line_no, line in _lines(chunks):
+        if line is None:
+            yield line_no, None, LINE_TOO_LONG
+            continue
+        if not line.strip():
+            continue
+        try:
+            data = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            yield line_no, None, "Некорректный JSON"
+            continue
+        if not isinstance(data, dict):
+            yield line_no, None, "Ожидается JSON-объект"
+            continue
+        yield line_no, data, None
+
+
+async def read_csv(chunks: AsyncIterable[bytes]) -> AsyncIterator[ImportRecord]:
+    """
+    CSV с заголовком (title, description, is_important, deadline_at; лишние колонки игнорируются).
+    Поле в кавычках может содержать переводы строк: запись собирается, пока кавычки не закрыты.
+    """
+    header = None
+    record: List[str] = []
+    start = 0
+    async for line_no, line in _lines(chunks):
+        if line is None:
+            record = []
+            yield line_no, None, LINE_TOO_LONG
+            continue
+        try:
+            text = line.decode("utf-8-sig" if line_no == 1 else "utf-8")
+        except UnicodeDecodeError:
+            record = []
+            yield line_no, None, "Строка не в кодировке UTF-8"
+            continue
+
+        if not record:
+            start = line_no
+        record.append(text)
+        if sum(part.count('"') for part in record) % 2:
+            continue  # кавычки не закрыты - запись продолжается на следующей строке
+
+        values = next(csv.reader(["\n".join(record)]), [])
+        record = []
+        if not any(value.strip() for value in values):
+            continue
+        if header is None:
+            header = [value.strip() for value in values]
+            continue
+        if len(values) != len(header):
+            yield start, None, f"Ожидается {len(header)} колонок, получено {len(values)}"
+            continue
+        # Пустое значение в CSV - отсутствующее поле
+        yield start, {key: value for key, value in zip(header, values) if value != ""}, None
+
+    if record:
+        yield start, None, "Незакрытые кавычки в конце файла"
+
+
+def _task_rows(user: UserPrincipal, tasks: List[TaskCreate]) -> List[dict]:
+    """Строки для вставки: квадранты считаются пачкой до загрузки"""
+    # Время создания и изменения - свое для каждой пачки: пачки долгого импорта фиксируются
+    # в разное время, и дельта-синхронизация должна видеть каждую (см. delta_sync.py)
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "title": task.title,
+            "description": task.description,
+            "is_important": task.is_important,
+            "deadline_at": task.deadline_at,
+            "quadrant": compute_quadrant(task.is_important, task.deadline_at),
+            "completed": False,
+            "created_at": now,
+            "updated_at": now,
+            "user_id": user.id
+        }
+        for task in tasks
+    ]
+
+
+async def _copy_rows(db: AsyncSession, user: UserPrincipal, rows: List[dict]) -> List[Tuple[int, datetime]]:
+    """
+    COPY через соединение asyncpg в транзакции сессии.
+    COPY не возвращает id, поэтому загруженные задачи находятся по диапазону id:
+    новые строки получают id больше максимального видимого до загрузки.
+    """
+    last_id = (await db.execute(select(func.max(Task.id)))).scalar() or 0
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        Task.__tablename__,
+        records=[tuple(row[column] for column in IMPORT_COLUMNS) for row in rows],
+        columns=IMPORT_COLUMNS
+    )
+    # В диапазон могут попасть и задачи параллельного импорта того же пользователя -
+    # для них таймер тоже верен, а повторная постановка ничего не меняет
+    result = await db.execute(
+        select(Task.id, Task.deadline_at)
+        .where(Task.id > last_id, Task.user_id == user.id, Task.deadline_at.isnot(None))
+    )
+    return result.all()
+
+
+async def _load_batch(
+    db: AsyncSession,
+    user: UserPrincipal,
+    tasks: List[TaskCreate],
+    on_loaded: Optional[ImportedCallback]
+) -> int:
+    rows = _task_rows(user, tasks)
+    if db.bind.dialect.name == "postgresql" and db.bind.dialect.driver == "asyncpg":
+        loaded = await _copy_rows(db, user, rows)
+    else:
+        # Остальные СУБД: один INSERT на всю пачку (executemany с RETURNING). Core-вставка
+        # по таблице: ORM-вставка пропускает None и делит пачку на отдельные INSERT
+        # по набору NULL-колонок
+        result = await db.execute(Task.__table__.insert().returning(Task.id, Task.deadline_at), rows)
+        loaded = [(task_id, deadline_at) for task_id, deadline_at in result if deadline_at is not None]
+    # Одно событие на пачку: клиент перечитывает список
+    await tasks_changed(db, [user.id], [task_event("imported", None, user.id, count=len(rows))])
+    await db.commit()
+    if on_loaded is not None and loaded:
+        on_loaded(loaded)
+    return len(rows)
+
+
+async def import_tasks(
+    db: AsyncSession,
+    user: UserPrincipal,
+    records: AsyncIterator[ImportRecord],
+    on_loaded: Optional[ImportedCallback] = None
+) -> dict:
+    """
+    Проверяет записи схемой TaskCreate и загружает пачками.
+    После фиксации пачки on_loaded получает id и дедлайны ее задач (для таймеров срочности).
+    """
+    imported, failed = 0, 0
+    errors: List[dict] = []
+    batch: List[TaskCreate] = []
+
+    async for line_no, data, error in records:
+        task = None
+        if error is None:
+            try:
+                task = TaskCreate.model_validate(data)
+            except ValidationError as e:
+                error = e.errors(include_url=False, include_context=False, include_input=False)
+        if task is None:
+            failed += 1
+            if len(errors) < IMPORT_MAX_ERRORS:
+                errors.append({"line": line_no, "error": error})
+            continue
+
+        batch.append(task)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            imported += await _load_batch(db, user, batch, on_loaded)
+            batch = []
+
+    if batch:
+        imported += await _load_batch(db, user, batch, on_loaded)
+
+    print(f"Импорт задач пользователя {user.id}: загружено {imported}, с ошибками {failed}")
+    return {"imported": imported, "failed": failed, "errors": errors}
@@ -0,0 +1,187 @@
+import asyncio
+import os
+import sys
+
+# Проверка бюджетов запросов к БД: приложение запускается в процессе (ASGI, без сервера)
+# на отдельной SQLite-БД, каждый маршрут вызывается в худшем случае (пустой кеш пользователей)
+# и число выполненных SQL-запросов сравнивается с QUERY_BUDGETS из query_budget.py.
+# Запуск: python test_query_budgets.py  (код выхода 1 - бюджет превышен или маршрут без бюджета)
+BUDGET_DATABASE_FILE = "./query_budget_check.db"
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{BUDGET_DATABASE_FILE}"
+os.environ.pop("DATABASE_READ_URL", None)
+
+import httpx
+from sqlalchemy import event
+from database import engine, init_db, AsyncSessionLocal
+from models import User, UserRole
+from auth_utils import get_password_hash
+from user_cache import user_cache
+from query_budget import QUERY_BUDGETS
+from main import app
+
+API = "/api/v3"
+
+# Тексты всех SQL-запросов, выполненных во время текущего HTTP-запроса
+executed = []
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    executed.append(statement)
+
+
+async def create_admin() -> None:
+    async with AsyncSessionLocal() as db:
+        db.add(User(
+            nickname="budget_admin",
+            email="budget_admin@example.com",
+            hashed_password=get_password_hash("admin_password"),
+            role=UserRole.ADMIN
+        ))
+        await db.commit()
+
+
+class BudgetCheck:
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.failed = []
+        self.checked = set()
+
+    async def call(self, method: str, template: str, url: str, token: str = None, **kwargs) -> httpx.Response:
+        # Худший случай: пользователя нет в кеше
+        user_cache.clear()
+        if token:
+            kwargs["headers"] = {"Authorization": f"Bearer {token}"}
+        executed.clear()
+        response = await self.client.request(method, API + url, **kwargs)
+        count = len(executed)
+
+        key = (method, API + template)
+        self.checked.add(key)
+        budget = QUERY_BUDGETS.get(key)
+        name = f"{method} {template}"
+        if response.status_code >= 300:
+            self.failed.append(name)
+            print(f" FAIL  {name}: статус {response.status_code} {response.text[:200]}")
+        elif budget is None:
+            self.failed.append(name)
+            print(f" FAIL  {name}: бюджет не задан ({count} запросов)")
+        elif count > budget:
+            self.failed.append(name)
+            print(f" FAIL  {name}: {count} запросов при бюджете {budget}")
+            for statement in executed:
+                print(f"       {' '.join(statement.split())[:150]}")
+        else:
+            print(f" OK    {name}: {count}/{budget}")
+        return response
+
+    async def login(self, email: str, password: str) -> str:
+        response = await self.call(
+            "POST", "/auth/login", "/auth/login",
+            data={"username": email, "password": password}
+        )
+        return response.json()["access_token"]
+
+
+async def test_query_budgets() -> bool:
+    print(" Проверка бюджетов запросов к БД (SQLite)...")
+    if os.path.exists(BUDGET_DATABASE_FILE):
+        os.remove(BUDGET_DATABASE_FILE)
+    await init_db()
+    await create_admin()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        check = BudgetCheck(client)
+
+        # Аутентификация
+        await check.call("POST", "/auth/register", "/auth/register", json={
+            "nickname": "budget_user", "email": "budget_user@example.com", "password": "user_password"
+        })
+        token = await check.login("budget_user@example.com", "user_password")
+        admin_token = await check.login("budget_admin@example.com", "admin_password")
+
+        # Запись задач
+        task_ids = []
+        for title in ("Первая задача", "Вторая задача", "Третья задача", "Четвертая задача"):
+            response = await check.call("POST", "/tasks", "/tasks", token, json={
+                "title": title, "description": "Проверка бюджета", "is_important": True,
+                "deadline_at": "2030-01-01T12:00:00Z"
+            })
+            task_ids.append(response.json()["id"])
+        first, second, third, fourth = task_ids
+
+        await check.call("PUT", "/tasks/{task_id}", f"/tasks/{first}", token, json={"is_important": False})
+        await check.call("PATCH", "/tasks/{task_id}/complete", f"/tasks/{first}/complete", token)
+        await check.call("POST", "/tasks/batch", "/tasks/batch", token, json={"operations": [
+            {"op": "create", "data": {"title": "Задача из пакета", "is_important": False}},
+            {"op": "update", "id": first, "data": {"title": "Обновленная задача", "is_important": True}},
+            {"op": "update", "id": second, "data": {"title": "Еще одна обновленная задача"}},
+            {"op": "complete", "id": fourth},
+            {"op": "delete", "id": third},
+        ]})
+        await check.call(
+            "POST", "/tasks/import", "/tasks/import?format=ndjson", token,
+            content=(
+                '{"title": "Импорт один", "is_important": true, "deadline_at": "2030-06-01T00:00:00Z"}\n'
+                '{"title": "Импорт два", "is_important": false}\n'
+            ).encode()
+        )
+
+        # Чтение задач
+        await check.call("GET", "/tasks", "/tasks?limit=2", token)
+        await check.call("GET", "/tasks", "/tasks?limit=2&fields=id,title,days_remaining", token)
+        await check.call("GET", "/tasks/quadrant/{quadrant}", "/tasks/quadrant/Q2", token)
+        await check.call("GET", "/tasks/search", "/tasks/search?q=задача", token)
+        await check.call("GET", "/tasks/status/{status}", "/tasks/status/pending", token)
+        await check.call("GET", "/tasks/today", "/tasks/today", token)
+        await check.call("GET", "/tasks/export", "/tasks/export?format=csv", token)
+        await check.call("GET", "/tasks/events", "/tasks/events?duration=0", token)
+        response = await check.call("GET", "/tasks/changes", "/tasks/changes?limit=2", token)
+        await check.call(
+            "GET", "/tasks/changes", "/tasks/changes", token,
+            params={"since": response.json()["next_cursor"]}
+        )
+        await check.call("GET", "/tasks/{task_id}", f"/tasks/{second}", token)
+
+        # Статистика
+        await check.call("GET", "/stats/", "/stats/", token)
+        await check.call("GET", "/stats/", "/stats/?group_by=user", admin_token)
+        await check.call("GET", "/stats/deadlines", "/stats/deadlines", token)
+
+        # Администрирование
+        await check.call("GET", "/admin/users", "/admin/users", admin_token)
+        await check.call("GET", "/admin/cache/users", "/admin/cache/users", admin_token)
+        await check.call("GET", "/admin/password-hashing", "/admin/password-hashing", admin_token)
+        await check.call("GET", "/admin/cache/results", "/admin/cache/results", admin_token)
+        await check.call("GET", "/admin/db/pool", "/admin/db/pool", admin_token)
+        await check.call("GET", "/admin/scheduler", "/admin/scheduler", admin_token)
+
+        await check.call("DELETE", "/tasks/{task_id}", f"/tasks/{first}", token)
+        await check.call("PATCH", "/auth/change-password", "/auth/change-password", token, json={
+            "old_password": "user_password", "new_password": "new_user_password"
+        })
+
+    # У каждого маршрута API должен быть бюджет, и каждый бюджет должен быть проверен
+    for route in app.routes:
+        if not getattr(route, "path", "").startswith(API):
+            continue
+        for method in route.methods - {"HEAD"}:
+            key = (method, route.path)
+            if key not in QUERY_BUDGETS:
+                check.failed.append(f"{method} {route.path}")
+                print(f" FAIL  {method} {route.path}: бюджет не задан")
+            elif key not in check.checked:
+                check.failed.append(f"{method} {route.path}")
+                print(f" FAIL  {method} {route.path}: маршрут не проверен")
+
+    await engine.dispose()
+    if check.failed:
+        print(f"\n Бюджет запросов нарушен в {len(check.failed)} проверках")
+        return False
+    print("\n ВСЕ МАРШРУТЫ УКЛАДЫВАЮТСЯ В БЮДЖЕТ ЗАПРОСОВ")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(test_query_budgets()) else 1)
@@ -0,0 +1,226 @@
+import asyncio
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+
+# Проверка планов запросов: на отдельной БД с большой таблицей задач маршруты и задания
+# планировщика вызываются в процессе (ASGI, без сервера), отправленные ими в БД запросы
+# перехватываются и для каждого SELECT по tasks выполняется EXPLAIN с теми же параметрами.
+# Падаем, если какой-то из них читает tasks целиком (последовательно или обходом всего индекса)
+# вместо поиска по индексу.
+# Запуск: python test_query_plans.py  (БД задается EXPLAIN_DATABASE_URL)
+EXPLAIN_DATABASE_URL = os.getenv("EXPLAIN_DATABASE_URL", "sqlite+aiosqlite:///./explain_check.db")
+EXPLAIN_TASKS = int(os.getenv("EXPLAIN_TASKS", "50000"))
+os.environ["DATABASE_URL"] = EXPLAIN_DATABASE_URL
+os.environ.pop("DATABASE_READ_URL", None)
+
+import httpx
+from sqlalchemy import select, insert, delete, func, event, text
+from database import engine
+from models import Task, User, UserRole
+from migrations import run_migrations
+from auth_utils import create_access_token
+from user_cache import user_cache
+from scheduler import update_task_urgency, seed_urgency_timers
+from pagination import encode_cursor
+from main import app
+
+API = "/api/v3"
+USERS = 200
+# Постоянное зерно: распределение данных, а с ним и выбор плана, одинаковы от запуска к запуску
+SEED = 20240601
+ADMIN_ID = USERS + 1
+
+# Запросы (текст, параметры), выполненные во время текущей проверки
+executed = []
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    if not executemany:
+        executed.append((statement, parameters))
+
+
+async def seed(conn) -> None:
+    """Заполняет БД пользователями и задачами, если она еще пустая"""
+    result = await conn.execute(select(func.count()).select_from(Task))
+    if result.scalar() >= EXPLAIN_TASKS:
+        return
+
+    await conn.execute(delete(Task))
+    await conn.execute(delete(User))
+    await conn.execute(insert(User), [
+        {
+            "id": user_id,
+            "nickname": f"explain{user_id}",
+            "email": f"explain{user_id}@example.com",
+            "hashed_password": "-",
+            "role": UserRole.ADMIN if user_id == ADMIN_ID else UserRole.USER
+        }
+        for user_id in range(1, ADMIN_ID + 1)
+    ])
+
+    rng = random.Random(SEED)
+    now = datetime.now(timezone.utc)
+    rows = []
+    for _ in range(EXPLAIN_TASKS):
+        deadline = now + timedelta(hours=rng.randint(-240, 2400)) if rng.random() < 0.7 else None
+        completed = rng.random() < 0.6
+        created = now - timedelta(minutes=rng.randint(0, 500000))
+        rows.append({
+            "title": "Задача",
+            "description": None,
+            "is_important": rng.random() < 0.5,
+            "deadline_at": deadline,
+            "quadrant": rng.choice(("Q1", "Q2", "Q3", "Q4")),
+            "completed": completed,
+            "created_at": created,
+            "updated_at": created,
+            "completed_at": now if completed else None,
+            "user_id": rng.randint(1, USERS)
+        })
+    await conn.execute(insert(Task), rows)
+
+
+def _reads_tasks(statement: str) -> bool:
+    words = statement.lstrip().split(None, 1)
+    return bool(words) and words[0].upper() in ("SELECT", "WITH") and "tasks" in statement
+
+
+async def explain(conn, statement: str, parameters) -> list:
+    """
+    Возвращает узлы плана, читающие таблицу tasks целиком: последовательное сканирование
+    или обход всего индекса без условия поиска по нему (тоже чтение каждой строки)
+    """
+    if conn.dialect.name == "postgresql":
+        result = await conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters)
+        plan = result.scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        full_scans = []
+        def walk(node):
+            if node.get("Relation Name") == "tasks":
+                node_type = node.get("Node Type")
+                if node_type == "Seq Scan":
+                    full_scans.append("Seq Scan on tasks")
+                elif node_type in ("Index Scan", "Index Only Scan") and "Index Cond" not in node:
+                    full_scans.append(f"{node_type} using {node.get('Index Name')} on tasks без Index Cond")
+            for child in node.get("Plans", []):
+                walk(child)
+        walk(plan[0]["Plan"])
+        return full_scans
+
+    result = await conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+    # Проходит только SEARCH tasks USING ... (поиск по индексу). SCAN tasks - чтение всей
+    # таблицы, SCAN tasks USING INDEX - обход всего индекса. "SCAN tasks_fts VIRTUAL TABLE ..." -
+    # поиск по индексу FTS5, это другая таблица
+    return [row[-1] for row in result.all() if row[-1].split()[:2] == ["SCAN", "tasks"]]
+
+
+# Проверки, которые читают всю таблицу по определению: список задач администратора
+# без фильтров (останавливается после страницы, но по всему индексу created_at)
+FULL_SCAN_ALLOWED = {
+    "GET /tasks (администратор)",
+}
+
+
+class PlanCheck:
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.failed = []
+
+    async def _check(self, name: str) -> None:
+        statements = {}
+        for statement, parameters in executed:
+            if _reads_tasks(statement):
+                statements.setdefault(statement, parameters)
+        if not statements:
+            self.failed.append(name)
+            print(f" FAIL  {name}: нет запросов к tasks")
+            return
+
+        full_scans = []
+        async with engine.connect() as conn:
+            for statement, parameters in statements.items():
+                for node in await explain(conn, statement, parameters):
+                    full_scans.append(node)
+                    print(f"       {' '.join(statement.split())[:150]}")
+        if full_scans and name in FULL_SCAN_ALLOWED:
+            print(f" OK    {name}: полное чтение разрешено ({', '.join(full_scans)})")
+        elif full_scans:
+            self.failed.append(name)
+            print(f" FAIL  {name}: {', '.join(full_scans)}")
+        else:
+            print(f" OK    {name}: {len(statements)} запросов")
+
+    async def get(self, name: str, url: str, token: str, **params) -> None:
+        user_cache.clear()
+        executed.clear()
+        response = await self.client.get(
+            API + url, params=params, headers={"Authorization": f"Bearer {token}"}
+        )
+        if response.status_code != 200:
+            self.failed.append(name)
+            print(f" FAIL  {name}: статус {response.status_code} {response.text[:200]}")
+            return
+        await self._check(name)
+
+    async def job(self, name: str, job) -> None:
+        executed.clear()
+        await job()
+        await self._check(name)
+
+
+async def test_query_plans() -> bool:
+    print(f" Проверка планов запросов на {EXPLAIN_DATABASE_URL} ({EXPLAIN_TASKS} задач)...")
+    async with engine.begin() as conn:
+        await run_migrations(conn)
+        await seed(conn)
+        await conn.execute(text("ANALYZE"))
+
+    token = create_access_token({"sub": "1", "role": UserRole.USER.value})
+    admin_token = create_access_token({"sub": str(ADMIN_ID), "role": UserRole.ADMIN.value})
+    async with engine.connect() as conn:
+        task_id = (await conn.execute(select(Task.id).where(Task.user_id == 1).limit(1))).scalar()
+    week_ago = datetime.now(timezone.utc) - timedelta(days=7)
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            check = PlanCheck(client)
+            await check.get("GET /tasks (страница)", "/tasks", token)
+            await check.get("GET /tasks (страница по курсору)", "/tasks", token,
+                            cursor=encode_cursor(week_ago, 1000))
+            await check.get("GET /tasks (администратор)", "/tasks", admin_token)
+            await check.get("GET /tasks/quadrant/{q}", "/tasks/quadrant/Q1", token)
+            await check.get("GET /tasks/status/{s}", "/tasks/status/pending", token)
+            await check.get("GET /tasks/today", "/tasks/today", token)
+            await check.get("GET /tasks/search", "/tasks/search", token, q="Задача")
+            await check.get("GET /tasks/changes (полная)", "/tasks/changes", token)
+            await check.get("GET /tasks/changes (по курсору)", "/tasks/changes", token,
+                            since=encode_cursor(week_ago, 0))
+            await check.get("GET /tasks/export", "/tasks/export", token)
+            await check.get("GET /tasks/{id}", f"/tasks/{task_id}", token)
+            await check.get("GET /stats/", "/stats/", token)
+            await check.get("GET /stats/?group_by=created_day", "/stats/", token, group_by="created_day")
+            await check.get("GET /stats/deadlines", "/stats/deadlines", token)
+            # Выгрузка всех задач администратором - полное чтение таблицы по определению, не проверяется
+
+            await check.job("scheduler: пересчет срочности", update_task_urgency)
+            await check.job("scheduler: загрузка таймеров", seed_urgency_timers)
+            failed = check.failed
+    finally:
+        await engine.dispose()
+
+    if failed:
+        print(f"\n Полное чтение tasks или ошибки в {len(failed)} проверках")
+        return False
+    print("\n ВСЕ ЗАПРОСЫ ИЩУТ ПО ИНДЕКСАМ")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(test_query_plans()) else 1)
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+# Проверка быстрого пути сериализации: project_rows + orjson должны давать тот же JSON,
+# что и TaskResponse.model_validate(...).model_dump(mode="json") для тех же строк из БД,
+# с дедлайном и без. Изменения GET /tasks/changes с любым fields= несут id и updated_at.
+# Запуск: python test_serializers.py  (код выхода 1 - форматы разошлись)
+SERIALIZERS_DATABASE_FILE = "./serializers_check.db"
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{SERIALIZERS_DATABASE_FILE}"
+os.environ.pop("DATABASE_READ_URL", None)
+
+import httpx
+import orjson
+from sqlalchemy import insert, select
+from database import engine, init_db, AsyncSessionLocal
+from auth_utils import create_access_token
+from models import Task, User, UserRole
+from schemas import TaskResponse
+from serializers import dumps, fieldset_columns, parse_fields, project_rows
+from main import app
+
+# Наборы полей: полный ответ и разреженные (fields=...)
+FIELDSETS = (None, "title,deadline_at", "days_remaining", "id,created_at,completed")
+# Поля, которые GET /tasks/changes отдает всегда: без них клиент не применит изменение
+CHANGE_KEY_FIELDS = ("id", "updated_at")
+
+
+async def seed() -> None:
+    now = datetime.now(timezone.utc)
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(User).values(
+            id=1, nickname="serializer", email="serializer@example.com",
+            hashed_password="-", role=UserRole.USER
+        ))
+        await db.execute(insert(Task), [
+            # Середина суток до дедлайна: days_remaining не зависит от секунд между вызовами
+            {"title": "С дедлайном", "description": "Описание", "is_important": True,
+             "deadline_at": now + timedelta(days=3, hours=12), "quadrant": "Q2",
+             "completed": False, "created_at": now, "user_id": 1},
+            {"title": "Без дедлайна", "description": None, "is_important": False,
+             "deadline_at": None, "quadrant": "Q4",
+             "completed": True, "created_at": now - timedelta(days=1), "completed_at": now, "user_id": 1},
+            {"title": "Просроченная", "description": "", "is_important": False,
+             "deadline_at": now - timedelta(days=2, hours=12), "quadrant": "Q3",
+             "completed": False, "created_at": now.replace(microsecond=0), "user_id": 1},
+        ])
+        await db.commit()
+
+
+async def check_changes_fieldsets() -> int:
+    """GET /tasks/changes?fields=...: в каждом изменении есть id и updated_at"""
+    failed = 0
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': '1', 'role': UserRole.USER.value})}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for value in FIELDSETS:
+            params = {"fields": value} if value is not None else {}
+            response = await client.get("/api/v3/tasks/changes", params=params, headers=headers)
+            name = f"GET /tasks/changes fields={value}"
+            if response.status_code != 200:
+                failed += 1
+                print(f" FAIL  {name}: статус {response.status_code} {response.text[:200]}")
+                continue
+            changed = response.json()["changed"]
+            missing = [
+                data for data in changed
+                if any(key not in data for key in CHANGE_KEY_FIELDS)
+            ]
+            if not changed or missing:
+                failed += 1
+                print(f" FAIL  {name}: нет {' или '.join(CHANGE_KEY_FIELDS)} в {missing or changed}")
+            else:
+                print(f" OK    {name}")
+    return failed
+
+
+async def test_serializers() -> bool:
+    print(" Проверка совпадения project_rows с TaskResponse...")
+    if os.path.exists(SERIALIZERS_DATABASE_FILE):
+        os.remove(SERIALIZERS_DATABASE_FILE)
+    await init_db()
+    await seed()
+
+    failed = 0
+    try:
+        async with AsyncSessionLocal() as db:
+            full_rows = (await db.execute(select(*fieldset_columns(None)).order_by(Task.id))).all()
+            for value in FIELDSETS:
+                fields = parse_fields(value)
+                rows = (await db.execute(select(*fieldset_columns(fields)).order_by(Task.id))).all()
+                fast = orjson.loads(dumps(project_rows(rows, fields)))
+                if len(fast) != len(full_rows):
+                    failed += 1
+                    print(f" FAIL  fields={value}: {len(fast)} задач вместо {len(full_rows)}")
+                for row, data in zip(full_rows, fast):
+                    expected = TaskResponse.model_validate(dict(row._mapping)).model_dump(mode="json")
+                    if fields is not None:
+                        expected = {name: expected[name] for name in fields}
+                    name = f"fields={value} {row.title}"
+                    if list(data.items()) != list(expected.items()):
+                        failed += 1
+                        print(f" FAIL  {name}:\n       project_rows: {data}\n       TaskResponse: {expected}")
+                    else:
+                        print(f" OK    {name}")
+
+        failed += await check_changes_fieldsets()
+    finally:
+        await engine.dispose()
+
+    if failed:
+        print(f"\n Форматы разошлись в {failed} проверках")
+        return False
+    print("\n ФОРМАТ БЫСТРОГО ПУТИ СОВПАДАЕТ С TaskResponse")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(test_serializers()) else 1)
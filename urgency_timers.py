@@ -0,0 +1,74 @@
+import heapq
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from models.task import URGENCY_THRESHOLD_DAYS
+
+
+def urgent_since(deadline_at: datetime) -> datetime:
+    """Момент, начиная с которого задача с таким дедлайном считается срочной"""
+    if deadline_at.tzinfo is None:
+        deadline_at = deadline_at.replace(tzinfo=timezone.utc)
+    return deadline_at - timedelta(days=URGENCY_THRESHOLD_DAYS + 1)
+
+
+class UrgencyTimerQueue:
+    """
+    Min-куча таймеров "задача станет срочной", ключ - дедлайн минус порог срочности.
+    Отмена и перенос таймера ленивые: устаревшие записи кучи пропускаются при извлечении.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime, int]] = []
+        self._due: Dict[int, datetime] = {}
+        # Вызывается, когда ближайший таймер сдвинулся раньше (нужно перевзвести планировщик)
+        self.on_change: Optional[Callable[[], None]] = None
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def schedule(self, task_id: int, deadline_at: Optional[datetime], notify: bool = True) -> None:
+        """Ставит (или переносит) таймер задачи по ее дедлайну"""
+        if deadline_at is None:
+            self.cancel(task_id)
+            return
+
+        due = urgent_since(deadline_at)
+        if due <= datetime.now(timezone.utc):
+            # Задача уже срочная - квадрант посчитан при записи, таймер не нужен
+            self.cancel(task_id)
+            return
+        if self._due.get(task_id) == due:
+            return
+
+        previous_next = self.next_due()
+        self._due[task_id] = due
+        heapq.heappush(self._heap, (due, task_id))
+        self._compact()
+
+        if notify and self.on_change and (previous_next is None or due < previous_next):
+            self.on_change()
+
+    def cancel(self, task_id: int) -> None:
+        self._due.pop(task_id, None)
+
+    def next_due(self) -> Optional[datetime]:
+        """Ближайший момент срабатывания (None, если таймеров нет)"""
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: datetime) -> List[int]:
+        """Извлекает задачи, чьи таймеры сработали к моменту now"""
+        task_ids = []
+        while self._heap and self._heap[0][0] <= now:
+            due, task_id = heapq.heappop(self._heap)
+            if self._due.get(task_id) == due:
+                del self._due[task_id]
+                task_ids.append(task_id)
+        return task_ids
+
+    def _compact(self) -> None:
+        # Не даем устаревшим записям раздувать кучу при частых переносах дедлайнов
+        if len(self._heap) > 2 * len(self._due) + 1024:
+            self._heap = [(due, task_id) for task_id, due in self._due.items()]
+            heapq.heapify(self._heap)